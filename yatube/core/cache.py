@@ -0,0 +1,360 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple, Union
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import (
+    get_cache_key,
+    learn_cache_key,
+    patch_vary_headers,
+)
+from django.views.decorators.http import condition
+
+from core import timing
+
+TAG_KEY = 'surrogate:{}'
+SURROGATE_KEY_HEADER = 'Surrogate-Key'
+LOCK_KEY = 'pagecache:lock:{}'
+STATS_KEY = 'pagecache:stats:{}'
+STATS = ('hit', 'stale', 'miss')
+USER_TAG = 'user:{pk}'
+
+View = Callable[..., HttpResponse]
+Entry = Tuple[HttpResponse, Dict[str, int], float]
+TagSource = Union[str, Callable[..., Iterable[str]]]
+
+
+def tag_versions(tags: Iterable[str]) -> Dict[str, int]:
+    """Возвращает текущие версии суррогатных ключей.
+
+    Все ключи читаются одним get_many. Отсутствующим ключам назначается
+    текущее время в миллисекундах, поэтому вытесненная из кеша версия
+    не вернётся к старому значению.
+    """
+    keys = {TAG_KEY.format(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    if len(found) < len(keys):
+        now = int(time.time() * 1000)
+        for key in keys.keys() - found.keys():
+            cache.add(key, now, None)
+        found.update(cache.get_many(keys.keys() - found.keys()))
+    return {keys[key]: version for key, version in found.items()}
+
+
+def purge(*tags: str) -> None:
+    """Делает недействительными все страницы с указанными ключами.
+
+    Новая версия ключа равна времени сброса в миллисекундах, но всегда
+    больше прежней, поэтому версии служат и водяными знаками для
+    Last-Modified.
+    """
+    keys = [TAG_KEY.format(tag) for tag in tags]
+    found = cache.get_many(keys)
+    now = int(time.time() * 1000)
+    cache.set_many(
+        {key: max(now, found.get(key, 0) + 1) for key in keys},
+        None,
+    )
+
+
+def tag_response(response: HttpResponse, *tags: str) -> HttpResponse:
+    """Помечает ответ суррогатными ключами.
+
+    Ключи попадают в заголовок Surrogate-Key, по которому внешний кеш
+    может сбрасывать страницы так же, как это делает purge.
+    """
+    surrogate_keys: Set[str] = getattr(response, 'surrogate_keys', set())
+    surrogate_keys.update(tags)
+    response.surrogate_keys = surrogate_keys
+    response[SURROGATE_KEY_HEADER] = ' '.join(sorted(surrogate_keys))
+    return response
+
+
+def count(event: str) -> None:
+    """Увеличивает общий для всех процессов счётчик страничного кеша.
+
+    Попадание или промах учитывается и в замерах текущего запроса.
+    """
+    timing.cache_lookup(event == 'hit', event == 'miss')
+    key = STATS_KEY.format(event)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def page_cache_stats() -> Dict[str, int]:
+    """Возвращает счётчики попаданий, устаревших попаданий и промахов."""
+    found = cache.get_many(STATS_KEY.format(event) for event in STATS)
+    return {event: found.get(STATS_KEY.format(event), 0) for event in STATS}
+
+
+def acquire(lock_key: str) -> bool:
+    """Захватывает блокировку перестроения страницы.
+
+    Блокировка живёт не дольше PAGE_CACHE_LOCK_TIMEOUT, поэтому упавший
+    процесс не оставит страницу без перестроения.
+    """
+    return cache.add(lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT)
+
+
+def _wait(cache_key: Optional[str], lock_key: str) -> Optional[Entry]:
+    """Ждёт, пока другой процесс положит страницу в кеш.
+
+    Ожидание прекращается, как только блокировка снята: ответ, который
+    нельзя кешировать, в кеш не попадёт, и ждать его дальше незачем.
+    """
+    if cache_key is None:
+        return None
+    deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(settings.PAGE_CACHE_WAIT_STEP)
+        # Блокировка снимается после записи в кеш, поэтому она
+        # проверяется до чтения страницы.
+        locked = cache.get(lock_key) is not None
+        entry = cache.get(cache_key)
+        if entry is not None or not locked:
+            return entry
+    return None
+
+
+def _lookup(
+    cache_key: Optional[str],
+    lock_key: str,
+) -> Tuple[Optional[HttpResponse], bool, bool]:
+    """Ищет страницу в кеше и решает, кто будет её перестраивать.
+
+    Returns:
+        Ответ, который можно отдать без перестроения, или None, признак
+        того, что блокировка перестроения захвачена этим вызовом, и
+        признак того, что отдаётся устаревшая страница.
+    """
+    entry = cache.get(cache_key) if cache_key is not None else None
+    if entry is not None:
+        response, versions, fresh_until = entry
+        if time.time() < fresh_until and tag_versions(versions) == versions:
+            count('hit')
+            return response, False, False
+    locked = acquire(lock_key)
+    stale = False
+    if entry is None:
+        count('miss')
+        if not locked:
+            entry = _wait(cache_key, lock_key)
+    elif not locked:
+        count('stale')
+        stale = True
+    if entry is not None and not locked:
+        return entry[0], False, stale
+    return None, locked, False
+
+
+def _cacheable(request: HttpRequest, response: HttpResponse) -> bool:
+    if response.status_code != 200 or response.streaming:
+        return False
+    if getattr(request, 'thumbnails_pending', False):
+        return False
+    if not request.META.get('CSRF_COOKIE_USED'):
+        return True
+    # В общую страницу нельзя сохранять чужой CSRF-токен.
+    if getattr(request, 'punch_holes', False):
+        return False
+    return settings.CSRF_COOKIE_NAME in request.COOKIES
+
+
+def cache_page_tagged(timeout: int, *tags: str) -> Callable[[View], View]:
+    """Кеширует страницу до сброса любого из её суррогатных ключей.
+
+    Ключи задаются шаблонами с именованными параметрами URL, например
+    'group:{slug}', и читаются до вызова представления. Представление
+    может добавить ключи через tag_response; их версии читаются уже
+    после отрисовки. Вместе с ответом сохраняются версии всех ключей,
+    и запись считается устаревшей, как только одна из них изменилась
+    или прошло timeout секунд.
+
+    Устаревшая запись хранится ещё PAGE_CACHE_STALE_TIMEOUT секунд:
+    пока один процесс, захвативший блокировку, перестраивает страницу,
+    остальные получают старую версию. При промахе без старой версии
+    остальные процессы ждут результат, а не идут в базу одновременно.
+
+    В ответ не добавляются Expires и max-age: страница живёт в кеше
+    сервера, а браузер перезапрашивает её. Запрос, получивший
+    устаревшую страницу, помечается page_stale.
+    """
+
+    def decorator(view: View) -> View:
+        key_prefix = f'{view.__module__}.{view.__name__}'
+
+        @wraps(view)
+        def wrapper(
+            request: HttpRequest,
+            *args: object,
+            **kwargs: object,
+        ) -> HttpResponse:
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            cache_key = get_cache_key(request, key_prefix, 'GET', cache=cache)
+            lock_key = LOCK_KEY.format(
+                hashlib.md5(
+                    (cache_key or key_prefix + request.path).encode(),
+                ).hexdigest(),
+            )
+            response, locked, stale = _lookup(cache_key, lock_key)
+            if response is not None:
+                request.page_stale = stale
+                return response
+            try:
+                return _render(
+                    view,
+                    request,
+                    args,
+                    kwargs,
+                    tag_versions(tag.format(**kwargs) for tag in tags),
+                    timeout,
+                    key_prefix,
+                )
+            finally:
+                if locked:
+                    cache.delete(lock_key)
+
+        return wrapper
+
+    return decorator
+
+
+def _render(
+    view: View,
+    request: HttpRequest,
+    args: Tuple[object, ...],
+    kwargs: Dict[str, object],
+    versions: Dict[str, int],
+    timeout: int,
+    key_prefix: str,
+) -> HttpResponse:
+    """Вызывает представление и сохраняет ответ в кеш вместе с версиями.
+
+    Vary: Cookie добавляется, только если к сессии обращалось само
+    представление, а не внешние декораторы.
+    """
+    session = getattr(request, 'session', None)
+    accessed = session is not None and session.accessed
+    if session is not None:
+        session.accessed = False
+    try:
+        response = view(request, *args, **kwargs)
+        private = session is not None and session.accessed
+    finally:
+        if session is not None:
+            session.accessed |= accessed
+    tag_response(response, *versions)
+    if not _cacheable(request, response):
+        return response
+    versions.update(
+        tag_versions(response.surrogate_keys - versions.keys()),
+    )
+    if private:
+        patch_vary_headers(response, ('Cookie',))
+    cache.set(
+        learn_cache_key(
+            request,
+            response,
+            timeout,
+            key_prefix,
+            cache=cache,
+        ),
+        (response, versions, time.time() + timeout),
+        timeout + settings.PAGE_CACHE_STALE_TIMEOUT,
+    )
+    return response
+
+
+def _validators(
+    request: HttpRequest,
+    sources: Tuple[TagSource, ...],
+    kwargs: Dict[str, object],
+) -> Tuple[str, datetime]:
+    """Считает ETag и Last-Modified страницы по версиям её ключей.
+
+    Результат запоминается в запросе, чтобы condition не читал версии
+    дважды.
+    """
+    validators = getattr(request, '_tag_validators', None)
+    if validators is not None:
+        return validators
+    tags = set()
+    for source in sources:
+        if callable(source):
+            tags.update(source(request, **kwargs))
+        else:
+            tags.add(source.format(**kwargs))
+    scope = 'anonymous'
+    if request.user.is_authenticated:
+        scope = str(request.user.pk)
+        tags.add(USER_TAG.format(pk=request.user.pk))
+    versions = tag_versions(tags)
+    etag = hashlib.md5(
+        repr((scope, sorted(versions.items()))).encode(),
+    ).hexdigest()
+    modified = datetime.fromtimestamp(
+        max(versions.values(), default=0) / 1000,
+        timezone.utc,
+    )
+    request._tag_validators = etag, modified
+    return request._tag_validators
+
+
+def conditional_page(*sources: TagSource) -> Callable[[View], View]:
+    """Отвечает 304 Not Modified, пока не сброшен ни один ключ страницы.
+
+    Ставится поверх кеширующих декораторов: ETag и Last-Modified
+    вычисляются только из версий суррогатных ключей, без запроса
+    страницы и отрисовки шаблона. Ключ задаётся шаблоном с параметрами
+    URL или функцией, которая по запросу и параметрам URL возвращает
+    ключи, известные только после дешёвого запроса к базе. В ETag
+    входят пользователь и версия его ключа USER_TAG: страница содержит
+    его фрагменты. Страница с ещё не готовыми миниатюрами и устаревшая
+    страница, отданная на время перестроения, уходят без валидаторов:
+    их ETag уже соответствует новым версиям ключей, и клиент закрепил
+    бы старое содержимое ответом 304.
+    """
+
+    def etag(request: HttpRequest, *args: object, **kwargs: object) -> str:
+        return _validators(request, sources, kwargs)[0]
+
+    def last_modified(
+        request: HttpRequest,
+        *args: object,
+        **kwargs: object,
+    ) -> datetime:
+        return _validators(request, sources, kwargs)[1]
+
+    def decorator(view: View) -> View:
+        conditional = condition(
+            etag_func=etag,
+            last_modified_func=last_modified,
+        )(view)
+
+        @wraps(view)
+        def wrapper(
+            request: HttpRequest,
+            *args: object,
+            **kwargs: object,
+        ) -> HttpResponse:
+            response = conditional(request, *args, **kwargs)
+            if any(
+                getattr(request, flag, False)
+                for flag in ('thumbnails_pending', 'page_stale')
+            ):
+                for header in ('ETag', 'Last-Modified'):
+                    if response.has_header(header):
+                        del response[header]
+            return response
+
+        return wrapper
+
+    return decorator
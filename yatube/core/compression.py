@@ -0,0 +1,98 @@
+import gzip
+import zlib
+from typing import Dict, Iterable, Iterator, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Кодировки в порядке предпочтения сервера и расширения их файлов.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Степень сжатия файлов, которые сжимаются один раз при сборке.
+BEST = {'br': 11, 'gzip': 9}
+
+# Степень сжатия ответов, которые сжимаются при запросе.
+FAST = {'br': 5, 'gzip': 6}
+
+
+def available() -> Iterator[str]:
+    """Перебирает кодировки, которые умеет сервер, по предпочтению."""
+    for encoding, _ in ENCODINGS:
+        if encoding != 'br' or brotli is not None:
+            yield encoding
+
+
+def accepted(header: str) -> Dict[str, float]:
+    """Разбирает Accept-Encoding в словарь кодировка -> вес."""
+    weights = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        weight = 1.0
+        if params.strip().startswith('q='):
+            try:
+                weight = float(params.strip()[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    return weights
+
+
+def acceptable(encoding: str, weights: Dict[str, float]) -> bool:
+    """Показывает, принимает ли клиент кодировку."""
+    return weights.get(encoding, weights.get('*', 0)) > 0
+
+
+def choose(header: str) -> Optional[str]:
+    """Выбирает кодировку ответа по Accept-Encoding или None."""
+    weights = accepted(header)
+    for encoding in available():
+        if acceptable(encoding, weights):
+            return encoding
+    return None
+
+
+def compress(content: bytes, encoding: str, quality: Dict[str, int]) -> bytes:
+    """Сжимает содержимое кодировкой encoding.
+
+    Args:
+        content: Исходное содержимое.
+        encoding: 'gzip' или 'br'.
+        quality: Степени сжатия по кодировкам, BEST или FAST.
+    """
+    if encoding == 'br':
+        return brotli.compress(content, quality=quality['br'])
+    return gzip.compress(content, compresslevel=quality['gzip'], mtime=0)
+
+
+def compress_stream(
+    chunks: Iterable[bytes],
+    encoding: str,
+    quality: Dict[str, int] = FAST,
+) -> Iterator[bytes]:
+    """Сжимает поток по частям.
+
+    После каждой части сжатые данные сбрасываются, поэтому клиент
+    получает начало ответа, не дожидаясь конца потока.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=quality['br'])
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(
+        quality['gzip'],
+        zlib.DEFLATED,
+        zlib.MAX_WBITS | 16,
+    )
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(
+            zlib.Z_SYNC_FLUSH,
+        )
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,152 @@
+import hashlib
+import re
+from functools import wraps
+from typing import Callable, Dict, Mapping, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+
+from core import timing
+from core.cache import USER_TAG, View, tag_versions
+
+FRAGMENT_KEY = 'fragment:{}'
+FRAGMENT_MARKER = '<!--fragment:{}-->'
+FRAGMENT_RE = re.compile(r'<!--fragment:([^<>]*?)-->')
+
+ContextBuilder = Callable[..., Dict[str, object]]
+
+_builders: Dict[str, ContextBuilder] = {}
+
+
+def register(name: str) -> Callable[[ContextBuilder], ContextBuilder]:
+    """Регистрирует функцию, готовящую контекст фрагмента.
+
+    Функция получает запрос и параметры фрагмента из шаблона. Без
+    регистрации фрагмент рисуется только с контекстом запроса.
+    """
+
+    def decorator(builder: ContextBuilder) -> ContextBuilder:
+        _builders[name] = builder
+        return builder
+
+    return decorator
+
+
+def punching(request: Optional[HttpRequest]) -> bool:
+    """Показывает, рисуется ли страница для общего кеша."""
+    return bool(getattr(request, 'punch_holes', False))
+
+
+def marker(name: str, params: Mapping[str, str]) -> str:
+    """Возвращает метку, на место которой позже встанет фрагмент."""
+    query = urlencode(sorted(params.items()))
+    return FRAGMENT_MARKER.format(f'{name}?{query}' if query else name)
+
+
+def render_fragment(
+    request: HttpRequest,
+    name: str,
+    params: Mapping[str, str],
+) -> str:
+    """Рисует фрагмент для текущего пользователя."""
+    builder = _builders.get(name)
+    context = builder(request, **params) if builder else dict(params)
+    return render_to_string(name, context, request=request)
+
+
+def fill_fragments(request: HttpRequest, response: HttpResponse) -> None:
+    """Подставляет в общую страницу фрагменты текущего пользователя.
+
+    Фрагменты кешируются по пользователю и имени представления; все
+    ключи страницы читаются одним get_many, рисуются только промахи.
+    Фрагменты с CSRF-токеном не кешируются. Кеш фрагментов пользователя
+    сбрасывается через purge(USER_TAG).
+    """
+    content = response.content.decode(response.charset)
+    found = set(FRAGMENT_RE.findall(content))
+    if not found:
+        return
+    scope = 'anonymous'
+    if request.user.is_authenticated:
+        user_tag = USER_TAG.format(pk=request.user.pk)
+        scope = f'{request.user.pk}.{tag_versions((user_tag,))[user_tag]}'
+    view_name = getattr(request.resolver_match, 'view_name', '')
+    keys = {
+        FRAGMENT_KEY.format(
+            hashlib.md5(f'{label}|{scope}|{view_name}'.encode()).hexdigest(),
+        ): label
+        for label in found
+    }
+    fragments = {keys[key]: html for key, html in cache.get_many(keys).items()}
+    timing.cache_lookup(len(fragments), len(keys) - len(fragments))
+    missing = {}
+    for key, label in keys.items():
+        if label in fragments:
+            continue
+        csrf_used = request.META.get('CSRF_COOKIE_USED', False)
+        request.META['CSRF_COOKIE_USED'] = False
+        name, _, query = label.partition('?')
+        fragments[label] = render_fragment(
+            request,
+            name,
+            dict(parse_qsl(query)),
+        )
+        if not request.META['CSRF_COOKIE_USED']:
+            missing[key] = fragments[label]
+        request.META['CSRF_COOKIE_USED'] |= csrf_used
+    cache.set_many(missing, settings.FRAGMENT_CACHE_TIMEOUT)
+    response.content = FRAGMENT_RE.sub(
+        lambda match: fragments[match.group(1)],
+        content,
+    )
+
+
+def shared_page(view: View) -> View:
+    """Делает закешированную страницу общей для всех пользователей.
+
+    Ставится поверх cache_page_tagged. Представление рисуется в режиме,
+    когда тег fragment оставляет метки вместо пользовательских частей,
+    поэтому тело страницы не обращается к сессии и кешируется без
+    Vary: Cookie. Метки заполняются при каждом запросе через
+    fill_fragments. Анонимные ответы помечаются как public и могут
+    храниться во внешнем кеше PAGE_CACHE_PROXY_TIMEOUT секунд; страница,
+    отданная устаревшей на время перестроения, так не помечается.
+    """
+
+    @wraps(view)
+    def wrapper(
+        request: HttpRequest,
+        *args: object,
+        **kwargs: object,
+    ) -> HttpResponse:
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        request.punch_holes = True
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            request.punch_holes = False
+        if response.streaming:
+            return response
+        fill_fragments(request, response)
+        if response.status_code != 200:
+            return response
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True)
+        elif not (
+            request.META.get('CSRF_COOKIE_USED')
+            or getattr(request, 'thumbnails_pending', False)
+            or getattr(request, 'page_stale', False)
+        ):
+            patch_cache_control(
+                response,
+                public=True,
+                s_maxage=settings.PAGE_CACHE_PROXY_TIMEOUT,
+            )
+        return response
+
+    return wrapper
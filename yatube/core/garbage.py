@@ -0,0 +1,272 @@
+import os
+import posixpath
+import sqlite3
+import tempfile
+import time
+from itertools import islice
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+)
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import thumbnails
+from core.models import Blob
+from core.storage import TEMP_DIR
+from core.utils import pk_batches
+
+FileFields = List[Tuple[Type[models.Model], models.FileField]]
+
+
+def walk(root: str) -> Iterator[Tuple[str, float]]:
+    """Лениво обходит каталог, выдавая пары (имя от root, mtime).
+
+    В памяти держится только стек ещё не обойдённых каталогов.
+    """
+    stack = ['']
+    while stack:
+        directory = stack.pop()
+        with os.scandir(os.path.join(root, directory)) as entries:
+            for entry in entries:
+                name = posixpath.join(directory, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    yield name, entry.stat(follow_symlinks=False).st_mtime
+
+
+def file_fields() -> FileFields:
+    return [
+        (model, field)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+
+
+def referenced(fields: FileFields, names: Iterable[str]) -> Set[str]:
+    """Возвращает имена, на которые ссылается хотя бы одно поле."""
+    names = list(names)
+    found: Set[str] = set()
+    for model, field in fields:
+        found.update(
+            model._default_manager.filter(
+                **{f'{field.name}__in': names},
+            ).values_list(field.name, flat=True),
+        )
+    return found
+
+
+class LiveThumbnails:
+    """Множество имён нужных миниатюр во временной базе SQLite.
+
+    Нужными считаются варианты THUMBNAIL_PREGENERATE всех картинок,
+    на которые ссылаются модели. Имена хранятся на диске, поэтому
+    память не растёт с числом картинок.
+    """
+
+    def __init__(self, fields: FileFields, batch_size: int) -> None:
+        """Заполняет множество, обходя модели пачками по batch_size."""
+        self.file = tempfile.NamedTemporaryFile(suffix='.sqlite3')
+        self.connection = sqlite3.connect(self.file.name)
+        self.connection.execute(
+            'CREATE TABLE live (name TEXT PRIMARY KEY) WITHOUT ROWID',
+        )
+        geometries = thumbnails.pregenerated()
+        for model, field in fields:
+            if not isinstance(field, models.ImageField):
+                continue
+            queryset = model._default_manager.exclude(**{field.name: ''})
+            for ids in pk_batches(queryset, batch_size):
+                self.connection.executemany(
+                    'INSERT OR IGNORE INTO live VALUES (?)',
+                    (
+                        (
+                            default.backend.thumbnail_name(
+                                ImageFile(getattr(instance, field.name)),
+                                geometry,
+                                dict(options),
+                            ),
+                        )
+                        for instance in queryset.filter(pk__in=ids).only(
+                            'pk',
+                            field.name,
+                        )
+                        for geometry, options in geometries
+                    ),
+                )
+        self.connection.commit()
+
+    def filter(self, names: Iterable[str]) -> Set[str]:
+        names = list(names)
+        if not names:
+            return set()
+        placeholders = ', '.join('?' * len(names))
+        return {
+            name
+            for name, in self.connection.execute(
+                f'SELECT name FROM live WHERE name IN ({placeholders})',
+                names,
+            )
+        }
+
+    def close(self) -> None:
+        self.connection.close()
+        self.file.close()
+
+
+def collect(
+    batch_size: int,
+    min_age: float,
+    rate: float = 0,
+    dry_run: bool = False,
+    report: Callable[[str], None] = lambda name: None,
+) -> Dict[str, int]:
+    """Удаляет из MEDIA_ROOT файлы, на которые никто не ссылается.
+
+    Каталог обходится лениво пачками по batch_size файлов; ссылки
+    каждой пачки проверяются одним запросом на поле модели. Мусором
+    считаются:
+
+    * исходники, на которые не ссылается ни одно FileField;
+    * миниатюры, не входящие в варианты THUMBNAIL_PREGENERATE живых
+      картинок; их записи удаляются и из хранилища ключей sorl;
+    * недописанные файлы временного каталога хранилища.
+
+    Файлы с живыми ссылками Blob не трогаются: их удаляет подсчёт
+    ссылок. Файлы моложе min_age секунд пропускаются, чтобы не удалить
+    загрузку, пост которой ещё не сохранён.
+
+    Args:
+        batch_size: Размер пачки файлов и постов.
+        min_age: Минимальный возраст удаляемого файла в секундах.
+        rate: Не больше стольких удалений в секунду; 0 - без ограничения.
+        dry_run: Только сообщить о мусоре, ничего не удаляя.
+        report: Вызывается с именем каждого найденного файла.
+
+    Returns:
+        Количество найденных файлов и их размер в байтах.
+    """
+    root = settings.MEDIA_ROOT
+    found = {'files': 0, 'bytes': 0}
+    if not os.path.isdir(root):
+        return found
+    fields = file_fields()
+    live = LiveThumbnails(fields, batch_size)
+    deadline = time.time() - min_age
+    files = walk(root)
+    try:
+        while True:
+            chunk = list(islice(files, batch_size))
+            if not chunk:
+                break
+            for name, is_thumbnail in _garbage(
+                [name for name, mtime in chunk if mtime < deadline],
+                fields,
+                live,
+            ):
+                size = _remove(root, name, is_thumbnail, dry_run)
+                if size is None:
+                    continue
+                found['files'] += 1
+                found['bytes'] += size
+                report(name)
+                if rate and not dry_run:
+                    time.sleep(1 / rate)
+    finally:
+        live.close()
+    return found
+
+
+def _garbage(
+    names: List[str],
+    fields: FileFields,
+    live: LiveThumbnails,
+) -> Iterator[Tuple[str, bool]]:
+    """Выбирает мусор из пачки имён.
+
+    Yields:
+        Имя файла и признак того, что это миниатюра.
+    """
+    prefix = thumbnail_settings.THUMBNAIL_PREFIX
+    previews = {name for name in names if name.startswith(prefix)}
+    sources = {
+        name
+        for name in names
+        if name not in previews and not name.startswith(f'{TEMP_DIR}/')
+    }
+    keep = (
+        live.filter(previews)
+        | referenced(fields, sources)
+        | set(
+            Blob.objects.filter(
+                name__in=sources,
+                references__gt=0,
+            ).values_list('name', flat=True),
+        )
+    )
+    for name in names:
+        if name not in keep:
+            yield name, name in previews
+
+
+def _remove(
+    root: str,
+    name: str,
+    is_thumbnail: bool,
+    dry_run: bool,
+) -> Optional[int]:
+    """Удаляет файл и его записи.
+
+    Файл хранилища по содержимому удаляется под блокировкой строки Blob
+    и только если ссылок на него по-прежнему нет: загрузка того же
+    содержимого могла прибавить ссылку уже после проверки в _garbage.
+
+    Returns:
+        Размер файла или None, если файл уже исчез или снова нужен.
+    """
+    path = os.path.join(root, name)
+    if dry_run:
+        try:
+            return os.path.getsize(path)
+        except FileNotFoundError:
+            return None
+    if is_thumbnail:
+        size = _unlink(path)
+        if size is not None:
+            default.kvstore.delete(
+                ImageFile(name, default.storage),
+                delete_thumbnails=False,
+            )
+        return size
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(name=name).first()
+        if blob is not None and blob.references > 0:
+            return None
+        size = _unlink(path)
+        if size is not None and blob is not None:
+            blob.delete()
+    return size
+
+
+def _unlink(path: str) -> Optional[int]:
+    """Удаляет файл и возвращает его размер или None, если его нет."""
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+    except FileNotFoundError:
+        return None
+    return size
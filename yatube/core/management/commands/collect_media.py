@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandParser
+
+from core import garbage
+
+BATCH_SIZE = 1000
+MIN_AGE = 60 * 60 * 24
+
+
+class Command(BaseCommand):
+    help = 'Удаляет картинки и миниатюры, на которые никто не ссылается.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Сколько файлов и записей обрабатывать за один проход.',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=float,
+            default=MIN_AGE,
+            help='Не трогать файлы моложе стольких секунд.',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=0,
+            help='Не больше стольких удалений в секунду.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет удалено.',
+        )
+
+    def handle(self, *args: object, **options: object) -> None:
+        verbose = options['dry_run'] or options['verbosity'] > 1
+        found = garbage.collect(
+            batch_size=options['batch_size'],
+            min_age=options['min_age'],
+            rate=options['rate'],
+            dry_run=options['dry_run'],
+            report=self.stdout.write if verbose else lambda name: None,
+        )
+        action = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{action} файлов: {found["files"]}, '
+                f'байт: {found["bytes"]}',
+            ),
+        )
@@ -0,0 +1,276 @@
+import mimetypes
+import os
+import posixpath
+import re
+from http import HTTPStatus
+from typing import (
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+from urllib.parse import quote
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.handlers.wsgi import get_path_info
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from core.storage import TEMP_DIR, is_blob_name
+
+BLOCK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+Headers = List[Tuple[str, str]]
+WSGIApplication = Callable[[dict, Callable], Iterable[bytes]]
+
+
+class Reply(NamedTuple):
+    """Ответ на запрос файла.
+
+    Attributes:
+        status: Код ответа.
+        headers: Заголовки ответа.
+        path: Путь к файлу, если нужно отдать тело.
+        start: Смещение первого байта тела.
+        length: Длина тела; None - файл целиком.
+    """
+
+    status: int
+    headers: Headers
+    path: Optional[str] = None
+    start: int = 0
+    length: Optional[int] = None
+
+
+def resolve(name: str, root: str) -> Optional[str]:
+    """Возвращает путь к файлу внутри root или None.
+
+    Имя уже раскодировано из URL и повторно не раскодируется. Имена вне
+    root и каталоги не отдаются.
+    """
+    name = posixpath.normpath(name).lstrip('/')
+    try:
+        path = safe_join(root, name)
+    except SuspiciousFileOperation:
+        return None
+    return path if os.path.isfile(path) else None
+
+
+def relative_name(path: str, root: str) -> str:
+    """Возвращает имя файла относительно root через прямые слеши."""
+    return os.path.relpath(path, root).replace(os.sep, '/')
+
+
+def etag(name: str, stat: os.stat_result) -> str:
+    """Возвращает сильный ETag файла.
+
+    У файлов хранилища по содержимому это SHA-256 из имени, у прочих -
+    размер и время изменения: файлы заменяются только целиком.
+    """
+    if is_blob_name(name):
+        return '"{}"'.format(posixpath.splitext(posixpath.basename(name))[0])
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def cache_control(name: str) -> str:
+    """Файлы с именем из хеша не меняются и кешируются навсегда."""
+    if is_blob_name(name) or name.startswith(
+        thumbnail_settings.THUMBNAIL_PREFIX,
+    ):
+        return IMMUTABLE
+    return f'public, max-age={settings.MEDIA_CACHE_TIMEOUT}'
+
+
+def byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Разбирает заголовок Range с одним диапазоном.
+
+    Returns:
+        Смещение и длина диапазона или None, если заголовок нужно
+        проигнорировать и отдать файл целиком.
+
+    Raises:
+        ValueError: Диапазон не пересекается с файлом.
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = min(int(last), size)
+        if not length:
+            raise ValueError(header)
+        return size - length, length
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end - start + 1
+
+
+def requested_range(
+    range_header: Optional[str],
+    if_range: Optional[str],
+    tag: str,
+    size: int,
+) -> Optional[Tuple[int, int]]:
+    """Возвращает запрошенный диапазон с учётом If-Range.
+
+    Если файл изменился с момента, указанного в If-Range, диапазон
+    игнорируется и отдаётся файл целиком.
+
+    Raises:
+        ValueError: Диапазон не пересекается с файлом.
+    """
+    if not range_header or (if_range and if_range.strip() != tag):
+        return None
+    return byte_range(range_header, size)
+
+
+def reply(
+    name: str,
+    method: str,
+    if_none_match: Optional[str] = None,
+    range_header: Optional[str] = None,
+    if_range: Optional[str] = None,
+) -> Reply:
+    """Готовит ответ на запрос файла MEDIA_ROOT.
+
+    Поддерживает If-None-Match, один диапазон Range с If-Range и, если
+    задан MEDIA_ACCEL_REDIRECT, передаёт отдачу тела nginx через
+    X-Accel-Redirect.
+
+    Args:
+        name: Путь файла от MEDIA_URL.
+        method: Метод запроса.
+        if_none_match: Заголовок If-None-Match.
+        range_header: Заголовок Range.
+        if_range: Заголовок If-Range.
+    """
+    if method not in ('GET', 'HEAD'):
+        return Reply(HTTPStatus.METHOD_NOT_ALLOWED, [('Allow', 'GET, HEAD')])
+    path = resolve(name, settings.MEDIA_ROOT)
+    name = relative_name(path, settings.MEDIA_ROOT) if path else ''
+    if not name or name.startswith(f'{TEMP_DIR}/'):
+        return Reply(HTTPStatus.NOT_FOUND, [])
+    stat = os.stat(path)
+    tag = etag(name, stat)
+    headers = [
+        ('ETag', tag),
+        ('Last-Modified', http_date(stat.st_mtime)),
+        ('Cache-Control', cache_control(name)),
+    ]
+    if if_none_match and (
+        if_none_match.strip() == '*' or tag in parse_etags(if_none_match)
+    ):
+        return Reply(HTTPStatus.NOT_MODIFIED, headers)
+    content_type, encoding = mimetypes.guess_type(name)
+    headers.append(
+        ('Content-Type', content_type or 'application/octet-stream'),
+    )
+    if encoding:
+        headers.append(('Content-Encoding', encoding))
+    if settings.MEDIA_ACCEL_REDIRECT:
+        headers.append(
+            ('X-Accel-Redirect', settings.MEDIA_ACCEL_REDIRECT + quote(name)),
+        )
+        return Reply(HTTPStatus.OK, headers)
+    headers.append(('Accept-Ranges', 'bytes'))
+    try:
+        found = requested_range(range_header, if_range, tag, stat.st_size)
+    except ValueError:
+        headers.append(('Content-Range', f'bytes */{stat.st_size}'))
+        return Reply(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, headers)
+    status, start, length = HTTPStatus.OK, 0, stat.st_size
+    if found is not None:
+        status, (start, length) = HTTPStatus.PARTIAL_CONTENT, found
+        headers.append(
+            (
+                'Content-Range',
+                f'bytes {start}-{start + length - 1}/{stat.st_size}',
+            ),
+        )
+    headers.append(('Content-Length', str(length)))
+    if method == 'HEAD':
+        return Reply(status, headers)
+    return Reply(
+        status,
+        headers,
+        path,
+        start,
+        None if status == HTTPStatus.OK else length,
+    )
+
+
+def read_range(file_: BinaryIO, start: int, length: int) -> Iterator[bytes]:
+    """Читает length байт файла с позиции start блоками и закрывает его."""
+    try:
+        file_.seek(start)
+        while length > 0:
+            chunk = file_.read(min(BLOCK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file_.close()
+
+
+def send(
+    result: Reply,
+    environ: dict,
+    start_response: Callable,
+) -> Iterable[bytes]:
+    """Отправляет ответ reply через WSGI.
+
+    Файл целиком отдаётся через wsgi.file_wrapper, так что gunicorn и
+    uWSGI шлют его через sendfile без копирования; диапазоны читаются
+    блоками.
+    """
+    status = HTTPStatus(result.status)
+    start_response(f'{status.value} {status.phrase}', result.headers)
+    if result.path is None:
+        return []
+    file_ = open(result.path, 'rb')
+    if result.length is None:
+        wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return wrapper(file_, BLOCK_SIZE)
+    return read_range(file_, result.start, result.length)
+
+
+class MediaApplication:
+    """WSGI-обёртка, отдающая MEDIA_URL без Django.
+
+    Запросы к файлам не проходят middleware и разбор URL.
+    """
+
+    def __init__(self, application: WSGIApplication) -> None:
+        """Оборачивает WSGI-приложение Django."""
+        self.application = application
+
+    def __call__(
+        self,
+        environ: dict,
+        start_response: Callable,
+    ) -> Iterable[bytes]:
+        path = get_path_info(environ)
+        if not settings.MEDIA_SERVE or not path.startswith(settings.MEDIA_URL):
+            return self.application(environ, start_response)
+        result = reply(
+            path.replace(settings.MEDIA_URL, '', 1),
+            environ['REQUEST_METHOD'],
+            environ.get('HTTP_IF_NONE_MATCH'),
+            environ.get('HTTP_RANGE'),
+            environ.get('HTTP_IF_RANGE'),
+        )
+        return send(result, environ, start_response)
@@ -0,0 +1,141 @@
+import hashlib
+import time
+from contextlib import ExitStack
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from core import compression, timing
+
+COMPRESSED_KEY = 'compressed:{encoding}:{digest}'
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'image/svg+xml',
+)
+
+
+def compressible(response: HttpResponse) -> bool:
+    """Показывает, имеет ли смысл сжимать ответ.
+
+    Уже сжатые ответы, частичные ответы и двоичные типы вроде картинок
+    не сжимаются; короткие тела не окупают заголовков gzip.
+    """
+    if response.status_code != 200 or response.has_header(
+        'Content-Encoding',
+    ):
+        return False
+    if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+        return False
+    return (
+        response.streaming
+        or len(response.content) >= settings.COMPRESSION_MIN_LENGTH
+    )
+
+
+def compressed_body(response: HttpResponse, encoding: str) -> bytes:
+    """Возвращает сжатое тело ответа, по возможности из кеша.
+
+    Сжатое тело хранится по хешу исходного: страницы из кеша
+    cache_page_tagged, в том числе общие страницы после подстановки
+    фрагментов, совпадают байт в байт и сжимаются один раз. Ответы с
+    Cache-Control: private не сохраняются, чтобы не засорять кеш
+    копиями личных страниц.
+    """
+    key = COMPRESSED_KEY.format(
+        encoding=encoding,
+        digest=hashlib.md5(response.content).hexdigest(),
+    )
+    body = cache.get(key)
+    if body is None:
+        body = compression.compress(
+            response.content,
+            encoding,
+            compression.FAST,
+        )
+        if 'private' not in response.get('Cache-Control', ''):
+            cache.set(key, body, settings.COMPRESSION_CACHE_TIMEOUT)
+    return body
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Сжимает ответы gzip или brotli по Accept-Encoding.
+
+    В отличие от GZipMiddleware не сжимает повторно одинаковые тела и
+    сжимает потоковые ответы по частям, не дожидаясь конца потока.
+    Brotli выбирается, только если установлен пакет brotli.
+    """
+
+    def process_response(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+    ) -> HttpResponse:
+        if not compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.choose(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''),
+        )
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = compression.compress_stream(
+                response.streaming_content,
+                encoding,
+            )
+            if response.has_header('Content-Length'):
+                del response['Content-Length']
+        else:
+            response.content = compressed_body(response, encoding)
+            response['Content-Length'] = str(len(response.content))
+        etag = response.get('ETag', '')
+        if etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+
+class ServerTimingMiddleware:
+    """Замеряет запрос и отдаёт замеры в заголовке Server-Timing.
+
+    Считает SQL-запросы и их время, время отрисовки шаблонов и поиска
+    миниатюр, попадания и промахи кешей. Замеры накапливаются по имени
+    представления и периодически пишутся в лог core.timing. Заголовок
+    отдаётся при DEBUG или SERVER_TIMING_HEADER и всегда - сотрудникам.
+    Ставится первым в MIDDLEWARE, чтобы total включал все остальные.
+    """
+
+    def __init__(self, get_response: Callable) -> None:
+        """Оборачивает следующий обработчик цепочки middleware."""
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        start = time.perf_counter()
+        with timing.measure() as timings, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(timing.execute_wrapper),
+                )
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        if self.show_header(request):
+            response['Server-Timing'] = timing.header(timings, total)
+        view_name = getattr(request.resolver_match, 'view_name', None)
+        if view_name:
+            timing.collect(view_name, timings, total)
+        return response
+
+    def show_header(self, request: HttpRequest) -> bool:
+        """Показывает, можно ли отдать замеры клиенту."""
+        if settings.DEBUG or settings.SERVER_TIMING_HEADER:
+            return True
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
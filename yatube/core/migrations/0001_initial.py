@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'name',
+                    models.CharField(
+                        max_length=255, unique=True, verbose_name='имя файла'
+                    ),
+                ),
+                (
+                    'digest',
+                    models.CharField(
+                        db_index=True, max_length=64, verbose_name='SHA-256'
+                    ),
+                ),
+                ('size', models.PositiveIntegerField(verbose_name='размер')),
+                (
+                    'references',
+                    models.PositiveIntegerField(
+                        default=0, verbose_name='количество ссылок'
+                    ),
+                ),
+                (
+                    'created',
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name='дата загрузки'
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'файл',
+                'verbose_name_plural': 'файлы',
+            },
+        ),
+    ]
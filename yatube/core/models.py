@@ -0,0 +1,25 @@
+from django.db import models
+
+from yatube.models import DefaultModel
+
+
+class Blob(DefaultModel):
+    """Файл хранилища ContentAddressedStorage.
+
+    Имя файла строится из SHA-256 содержимого, поэтому одинаковые
+    загрузки хранятся один раз. references считает поля моделей,
+    ссылающиеся на файл: файл удаляется, когда ссылок не остаётся.
+    """
+
+    name = models.CharField('имя файла', max_length=255, unique=True)
+    digest = models.CharField('SHA-256', max_length=64, db_index=True)
+    size = models.PositiveIntegerField('размер')
+    references = models.PositiveIntegerField('количество ссылок', default=0)
+    created = models.DateTimeField('дата загрузки', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'файл'
+        verbose_name_plural = 'файлы'
+
+    def __str__(self) -> str:
+        return self.name
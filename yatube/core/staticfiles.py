@@ -0,0 +1,199 @@
+import mimetypes
+import os
+import re
+from http import HTTPStatus
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage,
+    staticfiles_storage,
+)
+from django.core.files.base import ContentFile
+from django.core.handlers.wsgi import get_path_info
+from django.utils.http import http_date, parse_etags
+
+from core import compression
+from core.media import (
+    IMMUTABLE,
+    Reply,
+    WSGIApplication,
+    relative_name,
+    resolve,
+    send,
+)
+
+COMPRESSIBLE = (
+    '.css',
+    '.htm',
+    '.html',
+    '.ico',
+    '.js',
+    '.json',
+    '.map',
+    '.svg',
+    '.txt',
+    '.xml',
+)
+HASHED_RE = re.compile(r'^(.+)\.[0-9a-f]{12}((?:\.[^./]+)?)$')
+
+
+def compress(content: bytes) -> Dict[str, bytes]:
+    """Сжимает содержимое всеми доступными кодировками.
+
+    Brotli используется, только если установлен пакет brotli. Варианты,
+    не ставшие меньше исходника, отбрасываются.
+
+    Returns:
+        Словарь расширение файла -> сжатое содержимое.
+    """
+    suffixes = dict(compression.ENCODINGS)
+    variants = {
+        suffixes[encoding]: compression.compress(
+            content,
+            encoding,
+            compression.BEST,
+        )
+        for encoding in compression.available()
+    }
+    return {
+        suffix: data
+        for suffix, data in variants.items()
+        if len(data) < len(content)
+    }
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хранилище статики с хешем в именах и сжатыми копиями.
+
+    После обработки collectstatic рядом с каждым файлом с хешем в имени
+    сохраняются его копии .gz и .br, которые StaticApplication отдаёт
+    по Accept-Encoding.
+    """
+
+    def post_process(
+        self,
+        paths: Dict[str, Tuple[object, str]],
+        dry_run: bool = False,
+        **options: object,
+    ) -> Iterator[Tuple[str, Optional[str], object]]:
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in paths:
+            hashed_name = self.hashed_files.get(
+                self.hash_key(self.clean_name(name)),
+            )
+            if hashed_name and hashed_name.endswith(COMPRESSIBLE):
+                self.save_compressed(hashed_name)
+
+    def save_compressed(self, name: str) -> None:
+        """Сохраняет сжатые копии файла, заменяя старые."""
+        with self.open(name) as original:
+            variants = compress(original.read())
+        for suffix, data in variants.items():
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(data))
+
+
+def is_hashed(name: str) -> bool:
+    """Показывает, что имя взято из манифеста и содержит хеш файла."""
+    match = HASHED_RE.match(name)
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+    return bool(match) and hashed_files.get(''.join(match.groups())) == name
+
+
+def negotiate(path: str, header: str) -> Tuple[Optional[str], str]:
+    """Выбирает сжатую копию файла по Accept-Encoding.
+
+    Returns:
+        Кодировка или None и путь к отдаваемому файлу.
+    """
+    weights = compression.accepted(header)
+    for encoding, suffix in compression.ENCODINGS:
+        if compression.acceptable(encoding, weights) and os.path.isfile(
+            path + suffix,
+        ):
+            return encoding, path + suffix
+    return None, path
+
+
+def reply(
+    name: str,
+    method: str,
+    if_none_match: Optional[str] = None,
+    accept_encoding: str = '',
+) -> Reply:
+    """Готовит ответ на запрос файла STATIC_ROOT.
+
+    Файлы с хешем в имени кешируются навсегда. Если рядом лежит сжатая
+    копия, принимаемая клиентом, отдаётся она с Content-Encoding.
+
+    Args:
+        name: Путь файла от STATIC_URL.
+        method: Метод запроса.
+        if_none_match: Заголовок If-None-Match.
+        accept_encoding: Заголовок Accept-Encoding.
+    """
+    if method not in ('GET', 'HEAD'):
+        return Reply(HTTPStatus.METHOD_NOT_ALLOWED, [('Allow', 'GET, HEAD')])
+    path = resolve(name, settings.STATIC_ROOT)
+    if path is None:
+        return Reply(HTTPStatus.NOT_FOUND, [])
+    name = relative_name(path, settings.STATIC_ROOT)
+    encoding, served = negotiate(path, accept_encoding)
+    stat = os.stat(served)
+    tag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    headers = [
+        ('ETag', tag),
+        ('Last-Modified', http_date(stat.st_mtime)),
+        (
+            'Cache-Control',
+            IMMUTABLE
+            if is_hashed(name)
+            else f'public, max-age={settings.STATIC_CACHE_TIMEOUT}',
+        ),
+        ('Vary', 'Accept-Encoding'),
+    ]
+    if if_none_match and tag in parse_etags(if_none_match):
+        return Reply(HTTPStatus.NOT_MODIFIED, headers)
+    content_type, _ = mimetypes.guess_type(name)
+    headers.append(
+        ('Content-Type', content_type or 'application/octet-stream'),
+    )
+    if encoding:
+        headers.append(('Content-Encoding', encoding))
+    headers.append(('Content-Length', str(stat.st_size)))
+    if method == 'HEAD':
+        return Reply(HTTPStatus.OK, headers)
+    return Reply(HTTPStatus.OK, headers, served)
+
+
+class StaticApplication:
+    """WSGI-обёртка, отдающая собранную статику STATIC_URL без Django."""
+
+    def __init__(self, application: WSGIApplication) -> None:
+        """Оборачивает WSGI-приложение."""
+        self.application = application
+
+    def __call__(
+        self,
+        environ: dict,
+        start_response: Callable,
+    ) -> Iterable[bytes]:
+        path = get_path_info(environ)
+        prefix = settings.STATIC_URL
+        if (
+            not settings.STATIC_SERVE
+            or not settings.STATIC_ROOT
+            or not path.startswith(prefix)
+        ):
+            return self.application(environ, start_response)
+        result = reply(
+            path.replace(prefix, '', 1),
+            environ['REQUEST_METHOD'],
+            environ.get('HTTP_IF_NONE_MATCH'),
+            environ.get('HTTP_ACCEPT_ENCODING', ''),
+        )
+        return send(result, environ, start_response)
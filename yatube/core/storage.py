@@ -0,0 +1,108 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+from typing import Optional
+
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+from core.models import Blob
+
+TEMP_DIR = 'tmp'
+BLOB_NAME_RE = re.compile(
+    r'(?:^|/)([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}(?:\.\w+)?$',
+)
+
+
+def blob_name(name: str, digest: str) -> str:
+    """Возвращает имя файла с содержимым digest для загрузки name.
+
+    Каталог загрузки сохраняется, внутри него файлы раскладываются по
+    двум уровням каталогов из первых символов хеша.
+    """
+    extension = posixpath.splitext(name)[1].lower()
+    return posixpath.join(
+        posixpath.dirname(name),
+        digest[:2],
+        digest[2:4],
+        f'{digest}{extension}',
+    )
+
+
+def is_blob_name(name: Optional[str]) -> bool:
+    return bool(name) and BLOB_NAME_RE.search(name) is not None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла определяется его содержимым.
+
+    При сохранении файл потоково копируется во временный каталог с
+    подсчётом SHA-256, так что загрузка не читается в память целиком.
+    Если такое содержимое уже есть, копия удаляется, а у Blob
+    прибавляется ссылка. delete убирает одну ссылку и удаляет файл
+    вместе с последней. Файлы, сохранённые до перехода на это
+    хранилище, удаляются как обычно.
+    """
+
+    def get_available_name(
+        self,
+        name: str,
+        max_length: Optional[int] = None,
+    ) -> str:
+        return name
+
+    def _save(self, name: str, content: File) -> str:
+        directory = self.path(TEMP_DIR)
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as tmp:
+            for chunk in content.chunks():
+                digest.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+        try:
+            name = blob_name(name, digest.hexdigest())
+            with transaction.atomic():
+                blob, created = Blob.objects.select_for_update().get_or_create(
+                    name=name,
+                    defaults={
+                        'digest': digest.hexdigest(),
+                        'size': size,
+                        'references': 1,
+                    },
+                )
+                if not created:
+                    Blob.objects.filter(pk=blob.pk).update(
+                        references=F('references') + 1,
+                    )
+                path = self.path(name)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp.name, path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(path, self.file_permissions_mode)
+        finally:
+            if os.path.exists(tmp.name):
+                os.remove(tmp.name)
+        return name
+
+    def delete(self, name: str) -> None:
+        """Убирает одну ссылку на файл и удаляет его вместе с последней."""
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(name=name).first()
+            if blob is not None and blob.references > 1:
+                Blob.objects.filter(pk=blob.pk).update(
+                    references=F('references') - 1,
+                )
+                return
+            if blob is not None:
+                blob.delete()
+            super().delete(name)
+
+
+blob_storage = ContentAddressedStorage()
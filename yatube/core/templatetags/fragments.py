@@ -0,0 +1,24 @@
+from django import template
+from django.utils.safestring import SafeString, mark_safe
+
+from core.fragments import marker, punching, render_fragment
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def fragment(
+    context: template.Context,
+    name: str,
+    **params: object,
+) -> SafeString:
+    """Вставляет пользовательскую часть страницы.
+
+    На общей странице оставляет метку, которую заполнит fill_fragments,
+    иначе сразу рисует фрагмент для текущего запроса.
+    """
+    request = context['request']
+    params = {key: str(value) for key, value in params.items()}
+    if punching(request):
+        return mark_safe(marker(name, params))
+    return render_fragment(request, name, params)
@@ -0,0 +1,22 @@
+from typing import List, Optional
+
+from django import template
+from django.core.paginator import Page
+
+from core.utils import page_window
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def querystring(context: template.Context, **params: object) -> str:
+    """Возвращает строку запроса текущей страницы с заменёнными params."""
+    query = context['request'].GET.copy()
+    for key, value in params.items():
+        query[key] = str(value)
+    return f'?{query.urlencode()}'
+
+
+@register.filter
+def window(page: Page) -> List[Optional[int]]:
+    return page_window(page)
@@ -0,0 +1,92 @@
+import logging
+from typing import Dict, List, Optional
+
+from django import template
+from django.conf import settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+
+from core import thumbnails
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+MIME_TYPES = {
+    'GIF': 'image/gif',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+}
+
+
+@register.inclusion_tag('includes/responsive_image.html', takes_context=True)
+def responsive_image(
+    context: template.Context,
+    file_: object,
+    geometry_string: str,
+    sizes: str = '100vw',
+    lazy: bool = False,
+    **options: object,
+) -> Dict[str, object]:
+    """Рисует изображение с вариантами разной ширины и формата.
+
+    Для каждого формата, кроме запасного, выводится <source> с srcset,
+    запасной формат уходит в <img>. Ширина и высота тега берутся из
+    geometry_string, чтобы место под картинку резервировалось до её
+    загрузки. Пока ни один вариант не готов, рисуется заглушка.
+
+    Args:
+        file_: Исходный файл.
+        geometry_string: Наибольший размер вида ШИРИНАxВЫСОТА.
+        sizes: Значение атрибута sizes.
+        lazy: Добавить loading="lazy", например для лент.
+        options: Опции sorl-thumbnail.
+    """
+    request = context.get('request')
+    geometries = thumbnails.variants(geometry_string, **options)
+    try:
+        found, pending = thumbnails.ready_thumbnails(
+            file_,
+            geometries,
+            getattr(request, 'prefetched_thumbnails', None),
+        )
+    except Exception:
+        if thumbnail_settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception('Не удалось получить миниатюры')
+        found, pending = [None] * len(geometries), False
+    if pending and request is not None:
+        request.thumbnails_pending = True
+    ready: Dict[str, List[ImageFile]] = {}
+    for (_, variant), thumbnail in zip(geometries, found):
+        if thumbnail is not None:
+            ready.setdefault(variant['format'], []).append(thumbnail)
+    srcsets = [
+        (
+            format_,
+            ', '.join(
+                f'{image.url} {image.width}w' for image in ready[format_]
+            ),
+        )
+        for format_ in settings.THUMBNAIL_FORMATS
+        if format_ in ready
+    ]
+    fallback: Optional[Dict[str, str]] = None
+    if srcsets:
+        format_, srcset = srcsets[-1]
+        fallback = {'src': ready[format_][-1].url, 'srcset': srcset}
+    width, height = parse_geometry(geometry_string)
+    return {
+        'file': file_,
+        'sources': [
+            {'type': MIME_TYPES[format_], 'srcset': srcset}
+            for format_, srcset in srcsets[:-1]
+        ],
+        'fallback': fallback,
+        'sizes': sizes,
+        'lazy': lazy,
+        'width': width,
+        'height': height,
+    }
@@ -1,6 +1,44 @@
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+import zlib
 from http import HTTPStatus
+from typing import Dict, Iterator, List, Optional, Tuple
+from unittest import mock
+from urllib.parse import quote
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from core import compression
+from core.media import MediaApplication
+from core.middleware import CompressionMiddleware
+from core.models import Blob
+from core.staticfiles import StaticApplication
+from core.storage import blob_storage, is_blob_name
+from core.utils import CursorPaginator, decode_cursor, page_window
+from posts.models import Post
+
+User = get_user_model()
+
+AMMOUNT_OBJECTS = 7
+CURSOR_PAGE_SIZE = 3
+HUGE_PAGES_AMMOUNT = 50000
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_STATIC_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+STYLESHEET = b'body { color: black; }\n' * 100
+PAGE = b'<p>Yatube</p>\n' * 100
 
 
 class ViewTestClass(TestCase):
@@ -17,3 +55,475 @@ class ViewTestClass(TestCase):
             self.client.get('/nonexists-page/'),
             'core/404.html',
         )
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.posts = mixer.cycle(AMMOUNT_OBJECTS).blend(Post)
+
+    def setUp(self) -> None:
+        self.paginator = CursorPaginator(Post.objects.all(), CURSOR_PAGE_SIZE)
+
+    def walk(self) -> List[Post]:
+        """Обходит все страницы вперёд и возвращает записи по порядку."""
+        seen, cursor = [], None
+        while True:
+            page = self.paginator.page(cursor)
+            seen.extend(page)
+            if not page.has_next():
+                return seen
+            cursor = page.next_cursor
+
+    def test_walk_forward(self) -> None:
+        """Проход по курсорам выдаёт все записи от новых к старым."""
+        self.assertEqual(
+            self.walk(),
+            sorted(
+                self.posts,
+                key=lambda post: (post.created, post.pk),
+                reverse=True,
+            ),
+        )
+
+    def test_previous_page(self) -> None:
+        """Курсор назад возвращает ту же страницу, что была до перехода."""
+        first = self.paginator.page()
+        second = self.paginator.page(first.next_cursor)
+        self.assertFalse(first.has_previous())
+        self.assertEqual(
+            list(self.paginator.page(second.previous_cursor)),
+            list(first),
+        )
+
+    def test_stable_after_insert(self) -> None:
+        """Новые записи не сдвигают содержимое уже выданных страниц."""
+        first = self.paginator.page()
+        expected = list(self.paginator.page(first.next_cursor))
+        mixer.blend(Post)
+        self.assertEqual(
+            list(self.paginator.page(first.next_cursor)),
+            expected,
+        )
+
+    def test_broken_cursor(self) -> None:
+        """Повреждённый курсор приводит на первую страницу."""
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        self.assertEqual(
+            list(self.paginator.page('not-a-cursor')),
+            list(self.paginator.page()),
+        )
+
+    def test_cursor_mode_view(self) -> None:
+        """Параметр cursor включает keyset-режим в ленте."""
+        cache.clear()
+        page = self.client.get(
+            reverse('posts:index') + '?cursor=',
+        ).context['page_obj']
+        self.assertEqual(len(page), min(settings.PAGE_SIZE, AMMOUNT_OBJECTS))
+        self.assertFalse(page.has_previous())
+
+
+class PageWindowTest(TestCase):
+    def window(self, number: int, num_pages: int) -> List[Optional[int]]:
+        return page_window(Paginator(range(num_pages), 1).page(number))
+
+    def test_short_range(self) -> None:
+        """При малом числе страниц показываются все номера."""
+        self.assertEqual(self.window(3, 5), [1, 2, 3, 4, 5])
+
+    def test_elided_range(self) -> None:
+        """Далёкие страницы заменяются пропусками."""
+        self.assertEqual(
+            self.window(25000, HUGE_PAGES_AMMOUNT),
+            [1, None, 24998, 24999, 25000, 25001, 25002, None, 50000],
+        )
+
+    def test_window_size_is_constant(self) -> None:
+        """Длина списка не зависит от общего числа страниц."""
+        for num_pages in (10, 1000, HUGE_PAGES_AMMOUNT):
+            with self.subTest(num_pages=num_pages):
+                self.assertLessEqual(len(self.window(5, num_pages)), 9)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_same_content_stored_once(self) -> None:
+        """Одинаковое содержимое хранится одним файлом с двумя ссылками."""
+        first = blob_storage.save('posts/a.JPG', ContentFile(b'picture'))
+        second = blob_storage.save('posts/b.jpg', ContentFile(b'picture'))
+        self.assertEqual(first, second)
+        self.assertTrue(is_blob_name(first))
+        self.assertTrue(first.startswith('posts/'))
+        self.assertTrue(first.endswith('.jpg'))
+        self.assertEqual(Blob.objects.get(name=first).references, 2)
+        self.assertEqual(blob_storage.listdir('tmp'), ([], []))
+
+    def test_delete_last_reference(self) -> None:
+        """Файл удаляется только вместе с последней ссылкой."""
+        name = blob_storage.save('posts/a.jpg', ContentFile(b'shared'))
+        blob_storage.save('posts/b.jpg', ContentFile(b'shared'))
+        blob_storage.delete(name)
+        self.assertTrue(blob_storage.exists(name))
+        blob_storage.delete(name)
+        self.assertFalse(blob_storage.exists(name))
+        self.assertFalse(Blob.objects.filter(name=name).exists())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_ACCEL_REDIRECT=None)
+class MediaServeTest(TestCase):
+    CONTENT = b'0123456789'
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        self.name = blob_storage.save('posts/a.txt', ContentFile(self.CONTENT))
+        self.url = settings.MEDIA_URL + self.name
+
+    def test_full_file(self) -> None:
+        """Файл отдаётся целиком с ETag и вечным кешированием."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT)
+        self.assertIn(self.name.split('/')[-1][:-4], response['ETag'])
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_not_modified(self) -> None:
+        """Совпавший If-None-Match даёт 304 без тела."""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_ranges(self) -> None:
+        """Диапазоны отдаются с кодом 206 и заголовком Content-Range."""
+        cases = (
+            ('bytes=2-4', b'234', 'bytes 2-4/10'),
+            ('bytes=7-', b'789', 'bytes 7-9/10'),
+            ('bytes=-2', b'89', 'bytes 8-9/10'),
+            ('bytes=8-100', b'89', 'bytes 8-9/10'),
+        )
+        for header, body, content_range in cases:
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(
+                    response.status_code,
+                    HTTPStatus.PARTIAL_CONTENT,
+                )
+                self.assertEqual(b''.join(response.streaming_content), body)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(response['Content-Length'], str(len(body)))
+
+    def test_unsatisfiable_range(self) -> None:
+        """Диапазон за концом файла даёт 416."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(
+            response.status_code,
+            HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE,
+        )
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_stale_if_range(self) -> None:
+        """При несовпавшем If-Range файл отдаётся целиком."""
+        response = self.client.get(
+            self.url,
+            HTTP_RANGE='bytes=2-4',
+            HTTP_IF_RANGE='"stale"',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_forbidden_paths(self) -> None:
+        """Файлы вне MEDIA_ROOT и недописанные загрузки не отдаются."""
+        blob_storage.save('tmp/partial', ContentFile(b'partial'))
+        for path in ('../manage.py', '%2e%2e/manage.py', 'tmp/partial'):
+            with self.subTest(path=path):
+                self.assertEqual(
+                    self.client.get(settings.MEDIA_URL + path).status_code,
+                    HTTPStatus.NOT_FOUND,
+                )
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='/protected/')
+    def test_accel_redirect(self) -> None:
+        """С MEDIA_ACCEL_REDIRECT тело файла поручается nginx."""
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/protected/' + self.name,
+        )
+        self.assertEqual(response.content, b'')
+
+    def test_legacy_names(self) -> None:
+        """Имена с кириллицей и % отдаются и через WSGI, и через Django."""
+        name = blob_storage.path('legacy/фото a%20b.txt')
+        os.makedirs(os.path.dirname(name), exist_ok=True)
+        with open(name, 'wb') as legacy:
+            legacy.write(self.CONTENT)
+        url = settings.MEDIA_URL + 'legacy/фото a%20b.txt'
+        statuses = []
+        body = MediaApplication(lambda environ, start_response: [])(
+            {
+                # Сервер кладёт в PATH_INFO раскодированные байты как latin-1.
+                'PATH_INFO': url.encode().decode('latin-1'),
+                'REQUEST_METHOD': 'GET',
+            },
+            lambda status, headers: statuses.append(status),
+        )
+        self.assertEqual(statuses, ['200 OK'])
+        self.assertEqual(b''.join(body), self.CONTENT)
+        response = self.client.get(quote(url))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_wsgi_file_wrapper(self) -> None:
+        """WSGI-обёртка отдаёт файл через wsgi.file_wrapper сервера."""
+        calls = []
+
+        def file_wrapper(file_: object, block_size: int) -> List[bytes]:
+            calls.append(file_)
+            with file_:
+                return [file_.read()]
+
+        def start_response(status: str, headers: List[object]) -> None:
+            calls.append(status)
+
+        application = MediaApplication(lambda environ, start_response: [])
+        body = application(
+            {
+                'PATH_INFO': self.url,
+                'REQUEST_METHOD': 'GET',
+                'wsgi.file_wrapper': file_wrapper,
+            },
+            start_response,
+        )
+        self.assertEqual(body, [self.CONTENT])
+        self.assertEqual(calls[0], '200 OK')
+        self.assertEqual(len(calls), 2)
+
+
+@override_settings(
+    STATIC_ROOT=os.path.join(TEMP_STATIC_DIR, 'collected'),
+    STATICFILES_DIRS=[os.path.join(TEMP_STATIC_DIR, 'source')],
+    STATICFILES_FINDERS=[
+        'django.contrib.staticfiles.finders.FileSystemFinder',
+    ],
+    STATICFILES_STORAGE=(
+        'core.staticfiles.CompressedManifestStaticFilesStorage'
+    ),
+)
+class StaticFilesTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        source = os.path.join(TEMP_STATIC_DIR, 'source', 'css')
+        os.makedirs(source)
+        with open(os.path.join(source, 'site.css'), 'wb') as stylesheet:
+            stylesheet.write(STYLESHEET)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_STATIC_DIR, ignore_errors=True)
+
+    def setUp(self) -> None:
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.url = staticfiles_storage.url('css/site.css')
+
+    def get(self, path: str, **environ: str) -> Tuple[str, Dict, bytes]:
+        """Запрашивает файл у StaticApplication."""
+        response = {}
+
+        def start_response(status: str, headers: List[Tuple]) -> None:
+            response.update(status=status, headers=dict(headers))
+
+        body = StaticApplication(lambda environ, start_response: [])(
+            {'PATH_INFO': path, 'REQUEST_METHOD': 'GET', **environ},
+            start_response,
+        )
+        return response['status'], response['headers'], b''.join(body)
+
+    def test_collect_hashed_and_compressed(self) -> None:
+        """Сборка статики пишет файл с хешем в имени и его сжатую копию."""
+        name = self.url.replace(settings.STATIC_URL, '', 1)
+        self.assertRegex(name, r'^css/site\.[0-9a-f]{12}\.css$')
+        with staticfiles_storage.open(name + '.gz') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), STYLESHEET)
+
+    def test_serve_precompressed(self) -> None:
+        """Клиенту с gzip отдаётся сжатая копия с вечным кешированием."""
+        status, headers, body = self.get(
+            self.url,
+            HTTP_ACCEPT_ENCODING='gzip, deflate',
+        )
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', headers['Cache-Control'])
+        self.assertEqual(gzip.decompress(body), STYLESHEET)
+
+    def test_serve_identity(self) -> None:
+        """Без Accept-Encoding или при gzip;q=0 файл не сжимается."""
+        for header in ('', 'gzip;q=0'):
+            with self.subTest(header=header):
+                _, headers, body = self.get(
+                    self.url,
+                    HTTP_ACCEPT_ENCODING=header,
+                )
+                self.assertNotIn('Content-Encoding', headers)
+                self.assertEqual(body, STYLESHEET)
+
+    def test_unhashed_name_not_immutable(self) -> None:
+        """Файл без хеша в имени кешируется ненадолго."""
+        _, headers, _ = self.get(settings.STATIC_URL + 'css/site.css')
+        self.assertNotIn('immutable', headers['Cache-Control'])
+
+
+class CompressionMiddlewareTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.request = RequestFactory().get(
+            '/',
+            HTTP_ACCEPT_ENCODING='gzip',
+        )
+
+    def process(
+        self,
+        response: HttpResponse,
+        request: Optional[HttpRequest] = None,
+    ) -> HttpResponse:
+        """Пропускает ответ через CompressionMiddleware."""
+        return CompressionMiddleware(lambda request: response)(
+            request or self.request,
+        )
+
+    def test_compress_page(self) -> None:
+        """Страница сжимается, ETag ослабляется, Vary дополняется."""
+        response = HttpResponse(PAGE)
+        response['ETag'] = '"page"'
+        response = self.process(response)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], 'W/"page"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(
+            response['Content-Length'],
+            str(len(response.content)),
+        )
+        self.assertEqual(gzip.decompress(response.content), PAGE)
+
+    def test_same_body_compressed_once(self) -> None:
+        """Одинаковое тело сжимается один раз, дальше берётся из кеша."""
+        with mock.patch(
+            'core.middleware.compression.compress',
+            wraps=compression.compress,
+        ) as compress:
+            first = self.process(HttpResponse(PAGE))
+            second = self.process(HttpResponse(PAGE))
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(first.content, second.content)
+
+    def test_private_body_not_cached(self) -> None:
+        """Личные страницы сжимаются заново при каждом запросе."""
+        with mock.patch(
+            'core.middleware.compression.compress',
+            wraps=compression.compress,
+        ) as compress:
+            for _ in range(2):
+                response = HttpResponse(PAGE)
+                response['Cache-Control'] = 'private'
+                self.process(response)
+        self.assertEqual(compress.call_count, 2)
+
+    def test_skipped_responses(self) -> None:
+        """Не сжимаются картинки, короткие тела и клиенты без gzip."""
+        cases = (
+            (HttpResponse(PAGE, content_type='image/jpeg'), self.request),
+            (HttpResponse(b'<p>short</p>'), self.request),
+            (HttpResponse(PAGE), RequestFactory().get('/')),
+        )
+        for response, request in cases:
+            with self.subTest(content_type=response['Content-Type']):
+                response = self.process(response, request)
+                self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_stream_compressed_by_chunk(self) -> None:
+        """Потоковый ответ сжимается по частям, не дожидаясь конца."""
+        consumed = []
+
+        def chunks() -> Iterator[bytes]:
+            for chunk in (PAGE, PAGE):
+                consumed.append(chunk)
+                yield chunk
+
+        response = self.process(StreamingHttpResponse(chunks()))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        stream = iter(response.streaming_content)
+        first = next(stream)
+        self.assertEqual(len(consumed), 1)
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        self.assertEqual(decompressor.decompress(first), PAGE)
+        body = first + b''.join(stream)
+        self.assertEqual(gzip.decompress(body), PAGE * 2)
+
+
+# Страница с ещё не готовыми миниатюрами не кешируется.
+@override_settings(THUMBNAIL_WORKERS=0, SERVER_TIMING_HEADER=True)
+class ServerTimingTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        mixer.cycle(AMMOUNT_OBJECTS).blend(Post)
+
+    def timing(self) -> Dict[str, str]:
+        """Запрашивает главную и разбирает заголовок Server-Timing."""
+        response = self.client.get(reverse('posts:index'))
+        return dict(
+            metric.split(';', 1)
+            for metric in response['Server-Timing'].split(', ')
+        )
+
+    def test_header(self) -> None:
+        """Заголовок содержит SQL, шаблоны, кеш и общее время."""
+        metrics = self.timing()
+        self.assertRegex(metrics['sql'], r'^dur=[\d.]+;desc="[1-9]\d* SQL"$')
+        self.assertRegex(metrics['template'], r'^dur=[\d.]+$')
+        self.assertRegex(metrics['total'], r'^dur=[\d.]+$')
+        self.assertRegex(metrics['cache'], r'miss=[1-9]')
+
+    def test_cache_hit(self) -> None:
+        """Повторный запрос попадает в кеш страниц и не рисует шаблон."""
+        self.timing()
+        metrics = self.timing()
+        self.assertRegex(metrics['cache'], r'"hit=[1-9]\d* miss=0"')
+        self.assertNotIn('template', metrics)
+
+    @override_settings(SERVER_TIMING_LOG_INTERVAL=0)
+    def test_log_per_view(self) -> None:
+        """Статистика пишется в лог с именем представления."""
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            self.timing()
+        self.assertIn('view=posts:index requests=', logs.output[0])
+        self.assertEqual(logs.records[0].timing['view'], 'posts:index')
+
+    @override_settings(
+        SERVER_TIMING_HEADER=False,
+        SERVER_TIMING_LOG_INTERVAL=0,
+    )
+    def test_header_hidden_from_visitors(self) -> None:
+        """Посетителям замеры не отдаются, но в лог пишутся."""
+        with self.assertLogs('core.timing', 'INFO'):
+            response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.client.force_login(mixer.blend(User, is_staff=True))
+        response = self.client.get(reverse('posts:index'))
+        self.assertTrue(response.has_header('Server-Timing'))
+
+    def test_logger_enabled(self) -> None:
+        """Строки статистики не отбрасываются настройками логирования."""
+        self.assertTrue(
+            logging.getLogger('core.timing').isEnabledFor(logging.INFO),
+        )
@@ -0,0 +1,338 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, cache, caches
+from django.core.cache.backends.base import BaseCache
+from django.db import connections, transaction
+from PIL import Image
+from sorl.thumbnail import base, default
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.engines import pil_engine
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import KVStoreBase, add_prefix
+from sorl.thumbnail.parsers import parse_geometry
+
+from core import timing
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'thumbnail:pending:{}'
+FAILED_KEY = 'thumbnail:failed:{}'
+# Фон, на который кладутся прозрачные картинки в JPEG.
+JPEG_BACKGROUND = (255, 255, 255)
+
+Geometry = Tuple[str, Dict[str, object]]
+Prefetched = Mapping[str, Optional[ImageFile]]
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+class KVStore(KVStoreBase):
+    """Хранилище ключей sorl-thumbnail в кеше THUMBNAIL_CACHE.
+
+    В отличие от cached_db_kvstore не обращается к базе: сведения о
+    миниатюрах живут только в общем кеше. Потерянная запись не страшна:
+    файл миниатюры уже лежит в хранилище, и при повторной генерации
+    sorl лишь заново запишет его размеры. Кеш нельзя перебрать по
+    префиксу, поэтому cleanup и clear ничего не делают.
+    """
+
+    @property
+    def cache(self) -> BaseCache:
+        try:
+            return caches[thumbnail_settings.THUMBNAIL_CACHE]
+        except InvalidCacheBackendError:
+            return cache
+
+    def get_many(self, image_files: Iterable[ImageFile]) -> Prefetched:
+        """Читает записи нескольких изображений одним get_many.
+
+        Returns:
+            Словарь имя файла -> изображение; для отсутствующих None.
+        """
+        keys = {add_prefix(image.key): image.name for image in image_files}
+        found = self.cache.get_many(keys)
+        timing.cache_lookup(len(found), len(keys) - len(found))
+        return {
+            name: deserialize_image_file(found[key]) if key in found else None
+            for key, name in keys.items()
+        }
+
+    def _get_raw(self, key: str) -> Optional[str]:
+        return self.cache.get(key)
+
+    def _set_raw(self, key: str, value: str) -> None:
+        self.cache.set(key, value, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+
+    def _delete_raw(self, *keys: str) -> None:
+        self.cache.delete_many(keys)
+
+    def _find_keys_raw(self, prefix: str) -> List[str]:
+        return []
+
+
+class Engine(pil_engine.Engine):
+    """Движок PIL, сводящий прозрачность на белый фон для JPEG.
+
+    sorl оставляет прозрачным картинкам режим RGBA, а JPEG его не
+    поддерживает: без сведения запасной вариант из THUMBNAIL_FORMATS
+    для прозрачных GIF и PNG не создаётся.
+    """
+
+    def _colorspace(
+        self,
+        image: Image.Image,
+        colorspace: Optional[str],
+        format_: str,
+    ) -> Image.Image:
+        image = super()._colorspace(image, colorspace, format_)
+        if format_ != 'JPEG' or not (
+            image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        ):
+            return image
+        image = image.convert('RGBA')
+        flattened = Image.new('RGB', image.size, JPEG_BACKGROUND)
+        flattened.paste(image, mask=image.getchannel('A'))
+        return flattened
+
+
+class ThumbnailBackend(base.ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, умеющий искать миниатюру без генерации."""
+
+    def thumbnail_name(
+        self,
+        source: ImageFile,
+        geometry_string: str,
+        options: Dict[str, object],
+    ) -> str:
+        """Возвращает имя миниатюры так же, как get_thumbnail."""
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return self._get_thumbnail_filename(source, geometry_string, options)
+
+    def cached_thumbnail(
+        self,
+        file_: object,
+        geometry_string: str,
+        prefetched: Optional[Prefetched] = None,
+        **options: object,
+    ) -> Optional[ImageFile]:
+        """Возвращает готовую миниатюру или None, ничего не генерируя.
+
+        Если записи о миниатюре нет в хранилище ключей, например после
+        сброса кеша, но её файл уже лежит в хранилище, запись
+        восстанавливается по файлу без повторной генерации.
+
+        Args:
+            prefetched: Результат prefetch; миниатюры, найденные в нём,
+                не запрашиваются из хранилища ключей повторно.
+        """
+        name = self.thumbnail_name(ImageFile(file_), geometry_string, options)
+        thumbnail = ImageFile(name, default.storage)
+        if prefetched is not None and name in prefetched:
+            found = prefetched[name]
+        else:
+            found = default.kvstore.get(thumbnail)
+        if found is not None or not thumbnail.exists():
+            return found
+        default.kvstore.set(thumbnail)
+        return thumbnail
+
+
+def variants(geometry_string: str, **options: object) -> Tuple[Geometry, ...]:
+    """Возвращает варианты миниатюры для srcset.
+
+    Варианты строятся для ширин THUMBNAIL_WIDTHS меньше заданной и для
+    неё самой, с сохранением пропорций, в каждом формате из
+    THUMBNAIL_FORMATS. Последний формат считается запасным.
+
+    Args:
+        geometry_string: Наибольший размер вида ШИРИНАxВЫСОТА.
+        options: Опции sorl-thumbnail для всех вариантов.
+    """
+    width, height = parse_geometry(geometry_string)
+    widths = sorted(
+        {size for size in settings.THUMBNAIL_WIDTHS if size < width} | {width},
+    )
+    return tuple(
+        (
+            f'{size}x{round(height * size / width)}',
+            {**options, 'format': format_},
+        )
+        for format_ in settings.THUMBNAIL_FORMATS
+        for size in widths
+    )
+
+
+def pregenerated() -> Tuple[Geometry, ...]:
+    """Возвращает все варианты геометрий THUMBNAIL_PREGENERATE."""
+    return tuple(
+        variant
+        for geometry, options in settings.THUMBNAIL_PREGENERATE
+        for variant in variants(geometry, **options)
+    )
+
+
+def prefetch(
+    files: Iterable[object],
+    geometries: Iterable[Geometry] = (),
+) -> Prefetched:
+    """Находит миниатюры нескольких файлов за одно обращение к кешу.
+
+    Args:
+        files: Исходные файлы; пустые пропускаются.
+        geometries: Пары (геометрия, опции); по умолчанию pregenerated().
+
+    Returns:
+        Словарь имя миниатюры -> миниатюра или None для передачи в
+        ready_thumbnails. Если хранилище ключей не умеет get_many,
+        словарь пуст.
+    """
+    get_many = getattr(default.kvstore, 'get_many', None)
+    if get_many is None:
+        return {}
+    geometries = tuple(geometries) or pregenerated()
+    with timing.timer('thumbnails'):
+        return get_many(
+            ImageFile(
+                default.backend.thumbnail_name(
+                    ImageFile(file_),
+                    geometry,
+                    dict(options),
+                ),
+                default.storage,
+            )
+            for file_ in files
+            if file_
+            for geometry, options in geometries
+        )
+
+
+def _generate(source: ImageFile, geometries: Iterable[Geometry]) -> None:
+    try:
+        for geometry, options in geometries:
+            default.backend.get_thumbnail(source, geometry, **options)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', source)
+        cache.set(
+            FAILED_KEY.format(source.name),
+            True,
+            settings.THUMBNAIL_RETRY_AFTER,
+        )
+    finally:
+        cache.delete(PENDING_KEY.format(source.name))
+
+
+def _work(source: ImageFile, geometries: Iterable[Geometry]) -> None:
+    """Задача фонового потока: закрывает свои соединения с базой."""
+    try:
+        _generate(source, geometries)
+    finally:
+        connections.close_all()
+
+
+def pregenerate(
+    file_: object,
+    geometries: Iterable[Geometry] = (),
+) -> None:
+    """Ставит генерацию миниатюр файла в фоновый пул.
+
+    Вызывается после фиксации транзакции, чтобы пул видел сохранённый
+    файл. Повторная постановка того же файла, пока он в очереди,
+    игнорируется. При THUMBNAIL_WORKERS = 0 миниатюры создаются сразу
+    в этом потоке.
+
+    Args:
+        file_: Исходный файл поля модели или имя файла в хранилище
+            по умолчанию.
+        geometries: Пары (геометрия, опции); по умолчанию pregenerated().
+    """
+    global _executor
+    geometries = tuple(geometries) or pregenerated()
+    if not file_:
+        return
+    source = ImageFile(file_)
+    if not cache.add(
+        PENDING_KEY.format(source.name),
+        True,
+        settings.THUMBNAIL_RETRY_AFTER,
+    ):
+        return
+    if not settings.THUMBNAIL_WORKERS:
+        _generate(source, geometries)
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    _executor.submit(_work, source, geometries)
+
+
+def ready_thumbnails(
+    file_: object,
+    geometries: Iterable[Geometry],
+    prefetched: Optional[Prefetched] = None,
+) -> Tuple[List[Optional[ImageFile]], bool]:
+    """Ищет готовые миниатюры файла, недостающие ставит в генерацию.
+
+    Все недостающие геометрии ставятся одной задачей. Для исходного
+    файла, которого нет в хранилище, генерация не ставится: ждать её
+    бесполезно.
+
+    Args:
+        file_: Исходный файл.
+        geometries: Пары (геометрия, опции).
+        prefetched: Результат prefetch для страницы.
+
+    Returns:
+        Миниатюры или None в порядке geometries и признак того, что
+        часть из них ещё создаётся.
+    """
+    with timing.timer('thumbnails'):
+        return _ready_thumbnails(file_, tuple(geometries), prefetched)
+
+
+def _ready_thumbnails(
+    file_: object,
+    geometries: Tuple[Geometry, ...],
+    prefetched: Optional[Prefetched],
+) -> Tuple[List[Optional[ImageFile]], bool]:
+    if not file_:
+        return [None] * len(geometries), False
+    found = [
+        default.backend.cached_thumbnail(
+            file_,
+            geometry,
+            prefetched,
+            **options,
+        )
+        for geometry, options in geometries
+    ]
+    missing = tuple(
+        pair for pair, thumbnail in zip(geometries, found) if thumbnail is None
+    )
+    source = ImageFile(file_)
+    if (
+        not missing
+        or cache.get(FAILED_KEY.format(source.name))
+        or not source.exists()
+    ):
+        return found, False
+    if not settings.THUMBNAIL_WORKERS:
+        return [
+            thumbnail
+            or default.backend.get_thumbnail(file_, geometry, **options)
+            for (geometry, options), thumbnail in zip(geometries, found)
+        ], False
+    transaction.on_commit(lambda: pregenerate(source, missing))
+    return found, True
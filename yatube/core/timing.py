@@ -0,0 +1,217 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('sql', 'template', 'thumbnails')
+
+
+@dataclass
+class Timings:
+    """Замеры одного запроса.
+
+    Attributes:
+        durations: Суммарное время по метрикам METRICS, секунды.
+        queries: Количество SQL-запросов.
+        cache_hits: Попадания в кеш страниц, фрагментов, карточек и
+            миниатюр.
+        cache_misses: Промахи тех же кешей.
+        depth: Вложенность текущих замеров по метрикам; вложенный
+            замер той же метрики не учитывается повторно.
+    """
+
+    durations: Dict[str, float] = field(default_factory=dict)
+    queries: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    depth: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, metric: str, seconds: float) -> None:
+        self.durations[metric] = self.durations.get(metric, 0) + seconds
+
+
+@dataclass
+class ViewStats:
+    """Накопленные замеры представления за окно SERVER_TIMING_LOG_INTERVAL."""
+
+    started: float = field(default_factory=time.monotonic)
+    requests: int = 0
+    total: float = 0
+    queries: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    durations: Dict[str, float] = field(default_factory=dict)
+
+
+_current: ContextVar[Optional[Timings]] = ContextVar('timings', default=None)
+_stats: Dict[str, ViewStats] = {}
+_stats_lock = threading.Lock()
+
+
+def current() -> Optional[Timings]:
+    """Возвращает замеры текущего запроса или None вне запроса."""
+    return _current.get()
+
+
+@contextmanager
+def timer(metric: str) -> Iterator[None]:
+    """Добавляет время блока к метрике текущего запроса."""
+    timings = current()
+    if timings is None or timings.depth.get(metric):
+        yield
+        return
+    timings.depth[metric] = 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(metric, time.perf_counter() - start)
+        timings.depth[metric] = 0
+
+
+def cache_lookup(hits: int, misses: int) -> None:
+    """Учитывает попадания и промахи кеша в текущем запросе."""
+    timings = current()
+    if timings is not None:
+        timings.cache_hits += hits
+        timings.cache_misses += misses
+
+
+def execute_wrapper(
+    execute: Callable,
+    sql: str,
+    params: object,
+    many: bool,
+    context: Dict[str, object],
+) -> object:
+    """Обёртка connection.execute_wrapper, считающая SQL-запросы."""
+    timings = current()
+    if timings is None:
+        return execute(sql, params, many, context)
+    timings.queries += 1
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add('sql', time.perf_counter() - start)
+
+
+@contextmanager
+def measure() -> Iterator[Timings]:
+    """Собирает замеры запроса в пределах блока."""
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def header(timings: Timings, total: float) -> str:
+    """Формирует значение заголовка Server-Timing."""
+    metrics = [
+        f'sql;dur={timings.durations.get("sql", 0) * 1000:.1f};'
+        f'desc="{timings.queries} SQL"',
+    ]
+    metrics.extend(
+        f'{metric};dur={timings.durations[metric] * 1000:.1f}'
+        for metric in METRICS[1:]
+        if metric in timings.durations
+    )
+    metrics.append(
+        f'cache;desc="hit={timings.cache_hits} miss={timings.cache_misses}"',
+    )
+    metrics.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(metrics)
+
+
+def collect(view_name: str, timings: Timings, total: float) -> None:
+    """Добавляет замеры запроса к статистике представления.
+
+    Раз в SERVER_TIMING_LOG_INTERVAL секунд статистика представления
+    пишется в лог одной строкой и обнуляется.
+    """
+    now = time.monotonic()
+    with _stats_lock:
+        stats = _stats.setdefault(view_name, ViewStats(started=now))
+        stats.requests += 1
+        stats.total += total
+        stats.queries += timings.queries
+        stats.cache_hits += timings.cache_hits
+        stats.cache_misses += timings.cache_misses
+        for metric, seconds in timings.durations.items():
+            stats.durations[metric] = stats.durations.get(metric, 0) + seconds
+        if now - stats.started < settings.SERVER_TIMING_LOG_INTERVAL:
+            return
+        del _stats[view_name]
+    log(view_name, stats)
+
+
+def log(view_name: str, stats: ViewStats) -> None:
+    """Пишет статистику представления строкой ключ=значение.
+
+    Те же значения передаются в extra['timing'] для обработчиков,
+    пишущих структурированные логи.
+    """
+    averages = {
+        'requests': stats.requests,
+        'total_ms': stats.total * 1000 / stats.requests,
+        'sql_queries': stats.queries / stats.requests,
+        'cache_hits': stats.cache_hits,
+        'cache_misses': stats.cache_misses,
+    }
+    for metric in METRICS:
+        averages[f'{metric}_ms'] = (
+            stats.durations.get(metric, 0) * 1000 / stats.requests
+        )
+    fields: List[Tuple[str, object]] = [('view', view_name)]
+    fields.extend(
+        (name, round(value, 1) if isinstance(value, float) else value)
+        for name, value in averages.items()
+    )
+    logger.info(
+        ' '.join(f'{name}={value}' for name, value in fields),
+        extra={'timing': dict(fields)},
+    )
+
+
+class TimedTemplate(Template):
+    """Шаблон, время отрисовки которого учитывается в Server-Timing."""
+
+    def render(
+        self,
+        context: Optional[Dict[str, object]] = None,
+        request: Optional[object] = None,
+    ) -> str:
+        with timer('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django, замеряющий время отрисовки.
+
+    Учитываются шаблоны, загруженные через бэкенд: render,
+    render_to_string и get_template. Вложенные отрисовки не
+    суммируются дважды.
+    """
+
+    def from_string(self, template_code: str) -> TimedTemplate:
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name: str) -> TimedTemplate:
+        try:
+            return TimedTemplate(
+                self.engine.get_template(template_name),
+                self,
+            )
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,83 @@
+from io import BytesIO
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile, File
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
+
+SAVE_OPTIONS: Dict[str, Dict[str, object]] = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+
+
+def validate_image(file_: File) -> None:
+    """Проверяет размер загрузки и число пикселей картинки.
+
+    Пиксели считаются по заголовку, который forms.ImageField уже
+    прочитал в file_.image: картинка при этом не распаковывается.
+    """
+    if file_.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            code='file_too_large',
+            params={'limit': filesizeformat(settings.IMAGE_MAX_UPLOAD_SIZE)},
+        )
+    image = getattr(file_, 'image', None)
+    if image is not None and (
+        image.width * image.height > settings.IMAGE_MAX_PIXELS
+    ):
+        raise ValidationError(
+            'Слишком большая картинка: больше %(limit)s Мп.',
+            code='too_many_pixels',
+            params={'limit': settings.IMAGE_MAX_PIXELS // 10**6},
+        )
+
+
+def fit(size: Tuple[int, int], limit: int) -> Tuple[int, int]:
+    """Возвращает размер, вписанный в квадрат limit с сохранением сторон."""
+    width, height = size
+    scale = limit / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def downscale(file_: File) -> File:
+    """Уменьшает картинку, у которой сторона больше IMAGE_MAX_SIDE.
+
+    JPEG распаковывается через draft сразу в уменьшенном в 2-8 раз
+    виде, затем картинка сжимается в целое число раз через reduce и
+    только остаток масштабируется фильтром LANCZOS. Так в память не
+    попадает полноразмерный растр. Формат и EXIF сохраняются,
+    анимированные картинки не трогаются.
+
+    Returns:
+        Исходный файл или уменьшенная копия с тем же именем.
+    """
+    file_.seek(0)
+    image = Image.open(file_)
+    if max(image.size) <= settings.IMAGE_MAX_SIDE or getattr(
+        image,
+        'is_animated',
+        False,
+    ):
+        file_.seek(0)
+        return file_
+    format_, exif = image.format, image.info.get('exif')
+    target = fit(image.size, settings.IMAGE_MAX_SIDE)
+    image.draft(image.mode, target)
+    if image.mode in ('1', 'P'):
+        transparent = 'transparency' in image.info
+        image = image.convert('RGBA' if transparent else 'RGB')
+    factor = min(image.width // target[0], image.height // target[1])
+    if factor > 1:
+        image = image.reduce(factor)
+    image = image.resize(target, Image.LANCZOS)
+    output = BytesIO()
+    options = dict(SAVE_OPTIONS.get(format_, {}))
+    if exif:
+        options['exif'] = exif
+    image.save(output, format_, **options)
+    return ContentFile(output.getvalue(), name=file_.name)
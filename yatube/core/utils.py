@@ -1,15 +1,260 @@
+import base64
+import binascii
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple, Union
+
 from django.conf import settings
 from django.core.paginator import Page, Paginator
+from django.db.models import Model, Q
 from django.db.models.query import QuerySet
 from django.http import HttpRequest
+from django.utils.dateparse import parse_datetime
+
+CURSOR_PARAM = 'cursor'
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+CURSOR_SEPARATOR = '|'
+PAGE_WINDOW_ON_EACH_SIDE = 2
+PAGE_WINDOW_ON_ENDS = 1
+
+
+def encode_cursor(direction: str, created: datetime, pk: int) -> str:
+    """Упаковывает позицию в ленте в непрозрачную строку.
+
+    Args:
+        direction: Направление перехода: CURSOR_NEXT или CURSOR_PREVIOUS.
+        created: Дата создания граничной записи.
+        pk: Первичный ключ граничной записи.
+
+    Returns:
+        Строка, безопасная для использования в URL.
+    """
+    raw = CURSOR_SEPARATOR.join((direction, created.isoformat(), str(pk)))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[str, datetime, int]]:
+    """Распаковывает курсор, созданный encode_cursor.
+
+    Returns:
+        Кортеж (направление, дата, pk) или None для битого курсора.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, created, pk = raw.decode().split(CURSOR_SEPARATOR)
+        moment = parse_datetime(created)
+        if moment is None or direction not in (CURSOR_NEXT, CURSOR_PREVIOUS):
+            return None
+        return direction, moment, int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class CursorPage(Sequence):
+    """Страница keyset-пагинации.
+
+    Повторяет интерфейс django.core.paginator.Page, который нужен шаблонам,
+    но не знает ни номера страницы, ни общего числа записей.
+    """
+
+    def __init__(
+        self,
+        object_list: List[Model],
+        next_cursor: Optional[str],
+        previous_cursor: Optional[str],
+    ) -> None:
+        """Создаёт страницу.
+
+        Args:
+            object_list: Записи страницы в порядке показа.
+            next_cursor: Курсор следующей страницы, если она есть.
+            previous_cursor: Курсор предыдущей страницы, если она есть.
+        """
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self) -> str:
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def __getitem__(
+        self,
+        index: Union[int, slice],
+    ) -> Union[Model, List[Model]]:
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по паре (дата создания, pk).
+
+    Вместо COUNT(*) и OFFSET выбирает per_page + 1 записей после
+    граничной, поэтому стоимость страницы не зависит от её глубины,
+    а вставка новых записей не сдвигает уже открытые страницы.
+    """
+
+    def __init__(
+        self,
+        queryset: QuerySet,
+        per_page: int,
+        ordering: Tuple[str, str] = ('created', 'pk'),
+    ) -> None:
+        """Создаёт пагинатор.
+
+        Args:
+            queryset: Выборка, которую нужно разбить на страницы.
+            per_page: Количество записей на странице.
+            ordering: Поля даты и уникального ключа, по которым
+                строится курсор.
+        """
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+
+    def _after(self, created: datetime, pk: int, lookup: str) -> QuerySet:
+        created_field, pk_field = self.ordering
+        return self.queryset.filter(
+            Q(**{f'{created_field}__{lookup}': created})
+            | Q(**{created_field: created, f'{pk_field}__{lookup}': pk}),
+        )
+
+    def _cursor(self, direction: str, obj: Model) -> str:
+        created_field, pk_field = self.ordering
+        return encode_cursor(
+            direction,
+            getattr(obj, created_field),
+            getattr(obj, pk_field),
+        )
+
+    def page(self, cursor: Optional[str] = None) -> CursorPage:
+        """Возвращает страницу, начинающуюся сразу за курсором.
+
+        Пустой или повреждённый курсор означает первую страницу.
+        """
+        created_field, pk_field = self.ordering
+        position = decode_cursor(cursor) if cursor else None
+        backward = position is not None and position[0] == CURSOR_PREVIOUS
+        if position is None:
+            queryset = self.queryset
+        else:
+            queryset = self._after(
+                *position[1:],
+                lookup='gt' if backward else 'lt',
+            )
+        if backward:
+            queryset = queryset.order_by(created_field, pk_field)
+        else:
+            queryset = queryset.order_by(
+                f'-{created_field}',
+                f'-{pk_field}',
+            )
+        rows = list(queryset[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if backward:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        return CursorPage(
+            rows,
+            self._cursor(CURSOR_NEXT, rows[-1]) if rows and has_next else None,
+            (
+                self._cursor(CURSOR_PREVIOUS, rows[0])
+                if rows and has_previous
+                else None
+            ),
+        )
 
 
 def paginate(
     request: HttpRequest,
     queryset: QuerySet,
     pagesize: int = settings.PAGE_SIZE,
-) -> Page:
+    ordering: Tuple[str, str] = ('created', 'pk'),
+) -> Union[Page, CursorPage]:
+    """Разбивает выборку на страницы.
+
+    По умолчанию используется постраничная навигация Django. Если в
+    запросе есть параметр cursor (в том числе пустой), включается
+    keyset-режим без подсчёта записей по полям ordering.
+    """
+    if CURSOR_PARAM in request.GET:
+        return CursorPaginator(queryset, pagesize, ordering).page(
+            request.GET.get(CURSOR_PARAM),
+        )
     return Paginator(
         queryset,
         pagesize,
     ).get_page(request.GET.get('page'))
+
+
+def page_window(
+    page: Page,
+    on_each_side: int = PAGE_WINDOW_ON_EACH_SIDE,
+    on_ends: int = PAGE_WINDOW_ON_ENDS,
+) -> List[Optional[int]]:
+    """Возвращает номера страниц для ссылок с пропусками.
+
+    Вместо полного page_range остаются крайние страницы и окно вокруг
+    текущей, поэтому длина списка не зависит от общего числа страниц.
+
+    Args:
+        page: Текущая страница постраничной навигации.
+        on_each_side: Сколько соседних страниц показывать с каждой стороны.
+        on_ends: Сколько страниц показывать в начале и в конце.
+
+    Returns:
+        Номера страниц по возрастанию; None обозначает пропуск.
+    """
+    number, num_pages = page.number, page.paginator.num_pages
+    numbers = sorted(
+        {
+            *range(1, min(on_ends, num_pages) + 1),
+            *range(
+                max(number - on_each_side, 1),
+                min(number + on_each_side, num_pages) + 1,
+            ),
+            *range(max(num_pages - on_ends + 1, 1), num_pages + 1),
+        },
+    )
+    window: List[Optional[int]] = []
+    previous = 0
+    for current in numbers:
+        if current - previous > 2:
+            window.append(None)
+        elif current - previous == 2:
+            window.append(current - 1)
+        window.append(current)
+        previous = current
+    return window
+
+
+def pk_batches(queryset: QuerySet, batch_size: int) -> Iterator[List[int]]:
+    """Выдаёт первичные ключи выборки пачками по возрастанию.
+
+    Каждая пачка читается отдельным запросом по индексу pk, поэтому
+    обход не держит в памяти всю таблицу и не зависит от OFFSET.
+    """
+    last = None
+    while True:
+        batch = queryset.order_by('pk')
+        if last is not None:
+            batch = batch.filter(pk__gt=last)
+        ids = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
@@ -1,8 +1,16 @@
 from http import HTTPStatus
 
-from django.http import HttpRequest, HttpResponse, HttpResponseNotFound
+from django.http import (
+    FileResponse,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotFound,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render
 
+from core import media
+
 
 def page_not_found(
     request: HttpRequest,
@@ -22,3 +30,31 @@ def page_not_found(
 def csrf_failure(request: HttpRequest, reason: str = '') -> HttpResponse:
     del reason
     return render(request, 'core/403csrf.html', status=HTTPStatus.FORBIDDEN)
+
+
+def serve_media(request: HttpRequest, path: str) -> HttpResponse:
+    """Отдаёт файл MEDIA_ROOT с поддержкой Range и ETag.
+
+    Используется, когда запрос дошёл до Django; в боевом режиме файлы
+    перехватывает media.MediaApplication.
+    """
+    reply = media.reply(
+        path,
+        request.method,
+        request.META.get('HTTP_IF_NONE_MATCH'),
+        request.META.get('HTTP_RANGE'),
+        request.META.get('HTTP_IF_RANGE'),
+    )
+    if reply.path is None:
+        response = HttpResponse(status=reply.status)
+    elif reply.length is None:
+        response = FileResponse(open(reply.path, 'rb'), status=reply.status)
+    else:
+        file_ = open(reply.path, 'rb')
+        response = StreamingHttpResponse(
+            media.read_range(file_, reply.start, reply.length),
+            status=reply.status,
+        )
+    for header, value in reply.headers:
+        response[header] = value
+    return response
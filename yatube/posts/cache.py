@@ -0,0 +1,135 @@
+import hashlib
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from core import thumbnails, timing
+from core.cache import USER_TAG, purge
+from posts.models import Comment, Follow, Group, Post, User
+
+FEED_INDEX = 'feed:index'
+POST_TAG = 'post:{pk}'
+AUTHOR_TAG = 'author:{username}'
+GROUP_TAG = 'group:{slug}'
+POST_CARD_KEY = 'postcard:{}'
+POST_CARD_TEMPLATE = 'posts/includes/post.html'
+
+
+def purge_post(post: Post, old_group_id: Optional[int] = None) -> None:
+    """Сбрасывает страницы, на которых показан пост.
+
+    Args:
+        post: Созданный, изменённый или удалённый пост.
+        old_group_id: Группа поста до изменения, если она была другой.
+    """
+    tags = [
+        FEED_INDEX,
+        POST_TAG.format(pk=post.pk),
+        AUTHOR_TAG.format(username=post.author.username),
+    ]
+    tags.extend(
+        GROUP_TAG.format(slug=slug)
+        for slug in Group.objects.filter(
+            pk__in={post.group_id, old_group_id} - {None},
+        ).values_list('slug', flat=True)
+    )
+    purge(*tags)
+
+
+def purge_user(user: User, old_username: str) -> None:
+    """Сбрасывает страницы, на которых показаны имена пользователя.
+
+    Имя и логин автора есть в карточках главной, групп и профиля и на
+    странице поста, логин комментатора - на страницах постов с его
+    комментариями. Ключ профиля сбрасывается и для прежнего логина.
+    """
+    tags = {
+        FEED_INDEX,
+        AUTHOR_TAG.format(username=user.username),
+        AUTHOR_TAG.format(username=old_username),
+    }
+    tags.update(
+        GROUP_TAG.format(slug=slug)
+        for slug in Group.objects.filter(posts__author=user)
+        .values_list('slug', flat=True)
+        .distinct()
+    )
+    tags.update(
+        POST_TAG.format(pk=pk)
+        for pk in Comment.objects.filter(author=user)
+        .values_list('post_id', flat=True)
+        .distinct()
+    )
+    purge(*tags)
+
+
+def purge_group(group: Group) -> None:
+    purge(FEED_INDEX, GROUP_TAG.format(slug=group.slug))
+
+
+def purge_comment(comment: Comment) -> None:
+    purge(POST_TAG.format(pk=comment.post_id))
+
+
+def purge_follow(follow: Follow) -> None:
+    purge(
+        AUTHOR_TAG.format(username=follow.author.username),
+        AUTHOR_TAG.format(username=follow.user.username),
+        USER_TAG.format(pk=follow.user_id),
+    )
+
+
+def post_card_key(post: Post, view_name: str) -> str:
+    """Возвращает ключ карточки поста.
+
+    Ключ меняется при сохранении поста, смене группы или её slug, смене
+    имени автора, а также зависит от представления: на странице автора
+    и группы карточка прячет ссылки на них.
+    """
+    author = post.author
+    version = (
+        post.pk,
+        (post.modified or post.created).isoformat(),
+        post.group_id,
+        post.group.slug if post.group_id else None,
+        author.get_username(),
+        author.get_full_name(),
+        view_name,
+    )
+    return POST_CARD_KEY.format(
+        hashlib.md5(repr(version).encode()).hexdigest(),
+    )
+
+
+def post_cards(request: HttpRequest, posts: Iterable[Post]) -> List[str]:
+    """Возвращает HTML карточек постов в порядке выборки.
+
+    Все карточки страницы читаются одним get_many; шаблон рисуется
+    только для промахов, и они сохраняются одним set_many. Миниатюры
+    промахов тоже читаются заранее одним запросом. Карточки, миниатюра
+    которых ещё создаётся, не сохраняются.
+    """
+    view_name = getattr(request.resolver_match, 'view_name', '')
+    keys = [(post_card_key(post, view_name), post) for post in posts]
+    found = cache.get_many([key for key, _ in keys])
+    timing.cache_lookup(len(found), len(keys) - len(found))
+    request.prefetched_thumbnails = thumbnails.prefetch(
+        post.image for key, post in keys if key not in found
+    )
+    missing = {}
+    template = get_template(POST_CARD_TEMPLATE)
+    for key, post in keys:
+        if key in found:
+            continue
+        pending = getattr(request, 'thumbnails_pending', False)
+        request.thumbnails_pending = False
+        found[key] = template.render({'post': post}, request)
+        if not request.thumbnails_pending:
+            missing[key] = found[key]
+        request.thumbnails_pending |= pending
+    cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+    return [mark_safe(found[key]) for key, _ in keys]
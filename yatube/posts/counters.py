@@ -0,0 +1,95 @@
+from typing import Dict, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+
+def count_author(user_id: int) -> Dict[str, int]:
+    """Считает счётчики пользователя напрямую по таблицам."""
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def _get_or_count(user_id: int) -> Tuple[AuthorStats, bool]:
+    """Читает счётчики пользователя, считая их только для новой строки.
+
+    Returns:
+        Счётчики и признак того, что строка создана этим вызовом.
+    """
+    try:
+        return AuthorStats.objects.get(user_id=user_id), False
+    except AuthorStats.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            return (
+                AuthorStats.objects.create(
+                    user_id=user_id,
+                    **count_author(user_id),
+                ),
+                True,
+            )
+    except IntegrityError:
+        return AuthorStats.objects.get(user_id=user_id), False
+
+
+def author_stats(user_id: int) -> AuthorStats:
+    """Возвращает счётчики пользователя, создавая их при первом обращении."""
+    return _get_or_count(user_id)[0]
+
+
+def change_author(user_id: int, field: str, delta: int) -> None:
+    """Атомарно меняет счётчик пользователя на delta.
+
+    Отсутствующая строка при увеличении создаётся уже с актуальными
+    значениями, а при уменьшении не создаётся вовсе: пользователь может
+    удаляться каскадом, и значения посчитаются при следующем чтении.
+    """
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    if stats.update(**{field: F(field) + delta}) or delta < 0:
+        return
+    if not _get_or_count(user_id)[1]:
+        stats.update(**{field: F(field) + delta})
+
+
+def change_group(group_id: Optional[int], delta: int) -> None:
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=F('posts_count') + delta,
+        )
+
+
+def change_post(post_id: int, delta: int) -> None:
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta,
+    )
+
+
+def post_added(post: Post) -> None:
+    change_author(post.author_id, 'posts_count', 1)
+    change_group(post.group_id, 1)
+
+
+def post_removed(post: Post) -> None:
+    change_author(post.author_id, 'posts_count', -1)
+    change_group(post.group_id, -1)
+
+
+def post_moved(old_group_id: Optional[int], post: Post) -> None:
+    if old_group_id != post.group_id:
+        change_group(old_group_id, -1)
+        change_group(post.group_id, 1)
+
+
+def comment_changed(comment: Comment, delta: int) -> None:
+    change_post(comment.post_id, delta)
+
+
+def follow_changed(follow: Follow, delta: int) -> None:
+    change_author(follow.author_id, 'followers_count', delta)
+    change_author(follow.user_id, 'following_count', delta)
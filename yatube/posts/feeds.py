@@ -0,0 +1,198 @@
+import heapq
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.http import HttpRequest
+
+from core.utils import (
+    CURSOR_NEXT,
+    CURSOR_PARAM,
+    CURSOR_PREVIOUS,
+    CursorPage,
+    CursorPaginator,
+    decode_cursor,
+    encode_cursor,
+    paginate,
+)
+from posts import timeline
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+AUTHOR_POSTS_KEY = 'author_posts:{}'
+
+Key = Tuple[datetime, int]
+
+
+def forget_author(author_id: int) -> None:
+    """Сбрасывает закешированный список последних постов автора."""
+    cache.delete(AUTHOR_POSTS_KEY.format(author_id))
+
+
+def author_posts(author_ids: Iterable[int]) -> Dict[int, List[Key]]:
+    """Возвращает последние посты авторов как списки (created, pk).
+
+    Списки отсортированы от новых к старым и содержат не больше
+    FOLLOW_MERGE_DEPTH элементов. Все ключи читаются одним get_many,
+    промахи дозаполняются из базы.
+    """
+    keys = {AUTHOR_POSTS_KEY.format(pk): pk for pk in author_ids}
+    found = cache.get_many(keys)
+    lists = {keys[key]: value for key, value in found.items()}
+    missing = {}
+    for key, author_id in keys.items():
+        if key in found:
+            continue
+        missing[key] = lists[author_id] = list(
+            Post.objects.filter(author_id=author_id)
+            .order_by('-created', '-pk')
+            .values_list('created', 'pk')[: settings.FOLLOW_MERGE_DEPTH],
+        )
+    cache.set_many(missing, settings.AUTHOR_POSTS_CACHE_TIMEOUT)
+    return lists
+
+
+def _merge(
+    lists: List[List[Key]],
+    boundary: Optional[Key],
+    backward: bool,
+    limit: int,
+) -> Optional[List[Key]]:
+    """Сливает списки авторов в одну ленту с помощью кучи.
+
+    Returns:
+        До limit ключей от новых к старым или None, если ответ может
+        оказаться неполным из-за обрезанных списков.
+    """
+    horizon = max(
+        (
+            entries[-1]
+            for entries in lists
+            if len(entries) >= settings.FOLLOW_MERGE_DEPTH
+        ),
+        default=None,
+    )
+    if backward:
+        if horizon is not None and boundary < horizon:
+            return None
+        rows = list(
+            islice(
+                heapq.merge(
+                    *(
+                        reversed([key for key in entries if key > boundary])
+                        for entries in lists
+                    ),
+                ),
+                limit,
+            ),
+        )
+        rows.reverse()
+        return rows
+    rows = list(
+        islice(
+            heapq.merge(
+                *(
+                    (
+                        key
+                        for key in entries
+                        if boundary is None or key < boundary
+                    )
+                    for entries in lists
+                ),
+                reverse=True,
+            ),
+            limit,
+        ),
+    )
+    if horizon is not None and (len(rows) < limit or rows[-1] < horizon):
+        return None
+    return rows
+
+
+def merged_page(
+    user: User,
+    cursor: Optional[str],
+    per_page: int = settings.PAGE_SIZE,
+) -> Optional[CursorPage]:
+    """Собирает страницу ленты подписок из кешированных списков авторов.
+
+    Returns:
+        Страницу постов или None, если курсор ушёл глубже
+        закешированных списков и ответить должна таблица ленты.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    backward = position is not None and position[0] == CURSOR_PREVIOUS
+    rows = _merge(
+        list(
+            author_posts(
+                Follow.objects.filter(user=user).values_list(
+                    'author_id',
+                    flat=True,
+                ),
+            ).values(),
+        ),
+        position[1:] if position is not None else None,
+        backward,
+        per_page + 1,
+    )
+    if rows is None:
+        return None
+    has_more = len(rows) > per_page
+    rows = rows[1:] if backward and has_more else rows[:per_page]
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for _, pk in rows],
+    )
+    has_next = True if backward else has_more
+    has_previous = has_more if backward else position is not None
+    return CursorPage(
+        [posts[pk] for _, pk in rows if pk in posts],
+        encode_cursor(CURSOR_NEXT, *rows[-1]) if rows and has_next else None,
+        (
+            encode_cursor(CURSOR_PREVIOUS, *rows[0])
+            if rows and has_previous
+            else None
+        ),
+    )
+
+
+def use_merge(user: User) -> bool:
+    """Решает, читать ли ленту слиянием вместо таблицы ленты."""
+    return (
+        Follow.objects.filter(user=user).count()
+        >= settings.FOLLOW_MERGE_THRESHOLD
+    )
+
+
+def follow_feed(request: HttpRequest) -> Union[Page, CursorPage]:
+    """Возвращает страницу ленты подписок текущего пользователя.
+
+    Пользователи с большим числом подписок листают ленту курсорами:
+    страница собирается k-way слиянием кешированных списков авторов, а
+    страницы глубже этих списков читаются из таблицы ленты тем же
+    курсором. Явный номер страницы без курсора, как и лента остальных
+    пользователей, обслуживается обычной пагинацией.
+    """
+    cursor_mode = CURSOR_PARAM in request.GET or 'page' not in request.GET
+    if cursor_mode and use_merge(request.user):
+        cursor = request.GET.get(CURSOR_PARAM)
+        page_obj = merged_page(request.user, cursor)
+        if page_obj is not None:
+            return page_obj
+        page_obj = CursorPaginator(
+            timeline.feed(request.user),
+            settings.PAGE_SIZE,
+            timeline.ORDERING,
+        ).page(cursor)
+    else:
+        page_obj = paginate(
+            request,
+            timeline.feed(request.user),
+            ordering=timeline.ORDERING,
+        )
+    page_obj.object_list = [entry.post for entry in page_obj]
+    return page_obj
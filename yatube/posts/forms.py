@@ -1,5 +1,9 @@
+from typing import Optional
+
 from django import forms
+from django.core.files.base import File
 
+from core import uploads
 from posts.models import Comment, Post
 
 
@@ -16,6 +20,18 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой будет относиться пост',
         }
 
+    def clean_image(self) -> Optional[File]:
+        """Ограничивает размер новой картинки и уменьшает слишком большие.
+
+        Поле остаётся обычным forms.ImageField: оно открывает картинку
+        только по заголовку, проверки и уменьшение выполняются здесь.
+        """
+        image = self.cleaned_data['image']
+        if not hasattr(image, 'image'):
+            return image
+        uploads.validate_image(image)
+        return uploads.downscale(image)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,54 @@
+from typing import Callable, Tuple
+
+from core.storage import is_blob_name
+from core.utils import pk_batches
+from posts.models import Post
+
+
+def migrate_to_blobs(
+    batch_size: int,
+    after: int = 0,
+    checkpoint: Callable[[int], None] = lambda pk: None,
+) -> Tuple[int, int]:
+    """Переносит старые картинки постов в хранилище по содержимому.
+
+    Посты обходятся пачками по pk. Путь поста меняется условным UPDATE:
+    если пост успел сменить картинку, новая копия освобождается. Старый
+    файл удаляется, когда на него больше не ссылается ни один пост;
+    его миниатюры остаются на месте, поэтому закешированные страницы
+    продолжают работать. Уже перенесённые картинки пропускаются, так что
+    прерванный перенос можно запустить снова.
+
+    Args:
+        batch_size: Количество постов в пачке.
+        after: Начать с постов, pk которых больше after.
+        checkpoint: Вызывается с последним pk каждой обработанной пачки.
+
+    Returns:
+        Количество перенесённых картинок и ненайденных файлов.
+    """
+    storage = Post._meta.get_field('image').storage
+    migrated = missing = 0
+    posts = Post.objects.exclude(image='').filter(pk__gt=after)
+    for ids in pk_batches(posts, batch_size):
+        for pk, name in Post.objects.filter(pk__in=ids).values_list(
+            'pk',
+            'image',
+        ):
+            if is_blob_name(name):
+                continue
+            if not storage.exists(name):
+                missing += 1
+                continue
+            with storage.open(name) as file_:
+                new_name = storage.save(name, file_)
+            if not Post.objects.filter(pk=pk, image=name).update(
+                image=new_name,
+            ):
+                storage.delete(new_name)
+                continue
+            migrated += 1
+            if not Post.objects.filter(image=name).exists():
+                storage.delete(name)
+        checkpoint(ids[-1])
+    return migrated, missing
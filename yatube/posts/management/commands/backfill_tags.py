@@ -0,0 +1,38 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from posts import tags
+from posts.models import Post
+
+CHUNK_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Извлекает хештеги из текстов существующих постов.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help='Сколько постов обрабатывать за один проход.',
+        )
+
+    def handle(self, *args: object, **options: int) -> None:
+        chunk_size = options['chunk_size']
+        posts = (
+            Post.objects.only('pk', 'text', 'created')
+            .order_by('pk')
+            .iterator(chunk_size=chunk_size)
+        )
+        processed = 0
+        while True:
+            chunk = list(islice(posts, chunk_size))
+            if not chunk:
+                break
+            tags.sync(chunk)
+            processed += len(chunk)
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано постов: {processed}'),
+        )
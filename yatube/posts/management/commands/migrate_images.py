@@ -0,0 +1,72 @@
+import os
+from typing import Optional
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from posts import images
+
+BATCH_SIZE = 500
+
+
+def read_checkpoint(path: Optional[str]) -> int:
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as state:
+        return int(state.read().strip() or 0)
+
+
+def write_checkpoint(path: str, pk: int) -> None:
+    """Атомарно записывает последний обработанный pk."""
+    with open(f'{path}.tmp', 'w') as state:
+        state.write(str(pk))
+    os.replace(f'{path}.tmp', path)
+
+
+class Command(BaseCommand):
+    help = 'Переносит картинки постов в хранилище по содержимому.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Сколько постов обрабатывать за один проход.',
+        )
+        parser.add_argument(
+            '--state-file',
+            help=(
+                'Файл, в котором запоминается последний обработанный пост; '
+                'прерванный перенос продолжается с него.'
+            ),
+        )
+        parser.add_argument(
+            '--after',
+            type=int,
+            help='Начать с постов, pk которых больше указанного.',
+        )
+
+    def handle(self, *args: object, **options: object) -> None:
+        state_file = options['state_file']
+        after = options['after']
+        if after is None:
+            after = read_checkpoint(state_file)
+        if after:
+            self.stdout.write(f'Продолжение после поста {after}')
+        migrated, missing = images.migrate_to_blobs(
+            options['batch_size'],
+            after,
+            checkpoint=(
+                (lambda pk: write_checkpoint(state_file, pk))
+                if state_file
+                else (lambda pk: None)
+            ),
+        )
+        if state_file and os.path.exists(state_file):
+            os.remove(state_file)
+        self.stdout.write(
+            self.style.SUCCESS(f'Перенесено картинок: {migrated}'),
+        )
+        if missing:
+            self.stdout.write(
+                self.style.WARNING(f'Файлы не найдены: {missing}'),
+            )
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandParser
+
+from posts import search
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Заново строит полнотекстовый индекс постов.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Сколько постов индексировать за один проход.',
+        )
+
+    def handle(self, *args: object, **options: int) -> None:
+        if not search.available():
+            self.stdout.write(
+                self.style.WARNING('Полнотекстовый индекс не поддерживается.'),
+            )
+            return
+        indexed = search.rebuild(options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Проиндексировано постов: {indexed}'),
+        )
@@ -0,0 +1,108 @@
+from typing import Dict, List, Type
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import models, transaction
+from django.db.models import Count
+from django.db.models.query import QuerySet
+
+from core.utils import pk_batches
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+def grouped(queryset: QuerySet, field: str, ids: List[int]) -> Dict[int, int]:
+    """Считает записи выборки, сгруппированные по полю field."""
+    return dict(
+        queryset.filter(**{f'{field}__in': ids})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values_list(field, 'total'),
+    )
+
+
+def repair(
+    model: Type[models.Model],
+    ids: List[int],
+    actual: Dict[str, Dict[int, int]],
+    create: bool = False,
+) -> int:
+    """Сверяет счётчики пачки записей с фактическими значениями.
+
+    Args:
+        model: Модель со счётчиками.
+        ids: Первичные ключи пачки.
+        actual: Фактические значения: поле -> {pk: значение}.
+        create: Создавать ли отсутствующие строки счётчиков.
+
+    Returns:
+        Количество исправленных или созданных строк.
+    """
+    rows = model.objects.only(*actual).in_bulk(ids)
+    stale, missing = [], []
+    for pk in ids:
+        values = {field: counts.get(pk, 0) for field, counts in actual.items()}
+        row = rows.get(pk)
+        if row is None:
+            if create:
+                missing.append(model(pk=pk, **values))
+            continue
+        if all(getattr(row, name) == value for name, value in values.items()):
+            continue
+        for field, value in values.items():
+            setattr(row, field, value)
+        stale.append(row)
+    with transaction.atomic():
+        model.objects.bulk_update(stale, list(actual))
+        model.objects.bulk_create(missing, ignore_conflicts=True)
+    return len(stale) + len(missing)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Сколько записей сверять за один проход.',
+        )
+
+    def handle(self, *args: object, **options: int) -> None:
+        batch_size = options['batch_size']
+        repaired = 0
+        for ids in pk_batches(User.objects.all(), batch_size):
+            repaired += repair(
+                AuthorStats,
+                ids,
+                {
+                    'posts_count': grouped(Post.objects, 'author_id', ids),
+                    'followers_count': grouped(
+                        Follow.objects,
+                        'author_id',
+                        ids,
+                    ),
+                    'following_count': grouped(Follow.objects, 'user_id', ids),
+                },
+                create=True,
+            )
+        for ids in pk_batches(Group.objects.all(), batch_size):
+            repaired += repair(
+                Group,
+                ids,
+                {'posts_count': grouped(Post.objects, 'group_id', ids)},
+            )
+        for ids in pk_batches(Post.objects.all(), batch_size):
+            repaired += repair(
+                Post,
+                ids,
+                {'comments_count': grouped(Comment.objects, 'post_id', ids)},
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено счётчиков: {repaired}'),
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+from posts.models import TrendingScore
+
+
+class Command(BaseCommand):
+    help = (
+        'Сворачивает минутные счётчики популярности в таблицу. '
+        'Запускается периодически, например раз в несколько минут.'
+    )
+
+    def handle(self, *args: object, **options: object) -> None:
+        for kind, name in TrendingScore.KINDS:
+            saved = trending.roll_up(kind)
+            self.stdout.write(
+                self.style.SUCCESS(f'{name}: сохранено оценок {saved}'),
+            )
@@ -0,0 +1,93 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_timeline(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    for user_id, author_id in Follow.objects.values_list(
+        'user_id',
+        'author_id',
+    ).iterator():
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(
+                    user_id=user_id,
+                    post_id=post_id,
+                    created=created,
+                )
+                for post_id, created in Post.objects.filter(
+                    author_id=author_id,
+                ).values_list('pk', 'created')
+            ),
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0015_auto_20230217_2048'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'created',
+                    models.DateTimeField(verbose_name='дата создания поста'),
+                ),
+                (
+                    'post',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='timeline_entries',
+                        to='posts.Post',
+                        verbose_name='пост',
+                    ),
+                ),
+                (
+                    'user',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='timeline',
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name='подписчик',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'запись ленты',
+                'verbose_name_plural': 'записи ленты',
+                'ordering': ('-created',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(
+                fields=['user', 'created', 'post'],
+                name='timeline_user_created',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'post'), name='unique_timeline_entry'
+            ),
+        ),
+        migrations.RunPython(fill_timeline, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+
+    def total(queryset, field):
+        return Coalesce(
+            Subquery(
+                queryset.filter(**{field: OuterRef('pk')})
+                .order_by()
+                .values(field)
+                .annotate(total=Count('pk'))
+                .values('total'),
+            ),
+            0,
+        )
+
+    Group.objects.update(posts_count=total(Post.objects, 'group'))
+    Post.objects.update(comments_count=total(Comment.objects, 'post'))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0016_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                (
+                    'user',
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name='stats',
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name='пользователь',
+                    ),
+                ),
+                (
+                    'posts_count',
+                    models.PositiveIntegerField(
+                        default=0, verbose_name='количество постов'
+                    ),
+                ),
+                (
+                    'followers_count',
+                    models.PositiveIntegerField(
+                        default=0, verbose_name='количество подписчиков'
+                    ),
+                ),
+                (
+                    'following_count',
+                    models.PositiveIntegerField(
+                        default=0, verbose_name='количество подписок'
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'счётчики автора',
+                'verbose_name_plural': 'счётчики авторов',
+            },
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name='количество постов'
+            ),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name='количество комментариев',
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+        "text, tokenize = 'unicode61 remove_diacritics 2')",
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            Post.objects.values_list('pk', 'text').iterator(),
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0017_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0018_post_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'name',
+                    models.CharField(
+                        max_length=50, unique=True, verbose_name='имя'
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'хештег',
+                'verbose_name_plural': 'хештеги',
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'created',
+                    models.DateTimeField(verbose_name='дата создания поста'),
+                ),
+                (
+                    'post',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='post_tags',
+                        to='posts.Post',
+                        verbose_name='пост',
+                    ),
+                ),
+                (
+                    'tag',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='post_tags',
+                        to='posts.Tag',
+                        verbose_name='хештег',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'хештег поста',
+                'verbose_name_plural': 'хештеги постов',
+                'ordering': ('-created',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(
+                fields=['tag', 'created', 'post'], name='post_tag_created'
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='posttag',
+            constraint=models.UniqueConstraint(
+                fields=('post', 'tag'), name='unique_post_tag'
+            ),
+        ),
+    ]
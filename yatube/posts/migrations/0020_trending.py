@@ -0,0 +1,50 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0019_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'kind',
+                    models.CharField(
+                        choices=[('group', 'группа'), ('tag', 'хештег')],
+                        max_length=5,
+                        verbose_name='тип',
+                    ),
+                ),
+                (
+                    'object_id',
+                    models.PositiveIntegerField(verbose_name='объект'),
+                ),
+                ('score', models.FloatField(verbose_name='оценка')),
+                ('updated', models.DateTimeField(verbose_name='свёрнуто до')),
+            ],
+            options={
+                'verbose_name': 'рейтинг популярности',
+                'verbose_name_plural': 'рейтинги популярности',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='trendingscore',
+            constraint=models.UniqueConstraint(
+                fields=('kind', 'object_id'), name='unique_trending_score'
+            ),
+        ),
+    ]
@@ -1,6 +1,9 @@
+from typing import Iterable, Optional, Tuple
+
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from core.storage import blob_storage
 from yatube.models import DefaultModel, TimestampedModel
 
 User = get_user_model()
@@ -28,18 +31,57 @@ class AuthorCreatedModel(TimestampedModel):
         return self.text[:POST_SYMBOLS_LIMITATION]
 
 
-class Group(DefaultModel):
+class CountersModel(DefaultModel):
+    """Абстрактная модель со счётчиками, которые меняются через F().
+
+    Сохранение существующей записи не пишет поля counter_fields: иначе
+    значения, прочитанные до сохранения, затёрли бы приращения,
+    сделанные за это время другими запросами.
+    """
+
+    counter_fields: Tuple[str, ...] = ()
+
+    class Meta:
+        abstract = True
+
+    def save(
+        self,
+        force_insert: bool = False,
+        force_update: bool = False,
+        using: Optional[str] = None,
+        update_fields: Optional[Iterable[str]] = None,
+    ) -> None:
+        if update_fields is None and not (
+            self._state.adding or force_insert
+        ):
+            update_fields = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(force_insert, force_update, using, update_fields)
+
+
+class Group(CountersModel):
     titlemaxlenght = 200
 
     title = models.CharField('заголовок', max_length=titlemaxlenght)
     slug = models.SlugField('имя группы', unique=True)
     description = models.TextField('описание')
+    posts_count = models.PositiveIntegerField(
+        'количество постов',
+        default=0,
+        editable=False,
+    )
+
+    counter_fields = ('posts_count',)
 
     def __str__(self) -> str:
         return self.title
 
 
-class Post(AuthorCreatedModel):
+class Post(CountersModel, AuthorCreatedModel):
 
     group = models.ForeignKey(
         Group,
@@ -51,8 +93,16 @@ class Post(AuthorCreatedModel):
     image = models.ImageField(
         'картинка',
         upload_to='posts/',
+        storage=blob_storage,
         blank=True,
     )
+    comments_count = models.PositiveIntegerField(
+        'количество комментариев',
+        default=0,
+        editable=False,
+    )
+
+    counter_fields = ('comments_count',)
 
     class Meta(AuthorCreatedModel.Meta):
         verbose_name = 'пост'
@@ -105,3 +155,172 @@ class Follow(DefaultModel):
             f'Пользователь {self.user.username} '
             f'подписан на автора {self.author.username}'
         )
+
+
+class AuthorStats(DefaultModel):
+    """Счётчики пользователя, которые поддерживаются сигналами."""
+
+    user = models.OneToOneField(
+        User,
+        verbose_name='пользователь',
+        related_name='stats',
+        primary_key=True,
+        on_delete=models.CASCADE,
+    )
+    posts_count = models.PositiveIntegerField('количество постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'количество подписчиков',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        'количество подписок',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'счётчики автора'
+        verbose_name_plural = 'счётчики авторов'
+
+    def __str__(self) -> str:
+        return f'Счётчики пользователя {self.user_id}'
+
+
+class TimelineEntry(DefaultModel):
+    """Запись материализованной ленты подписок.
+
+    Заполняется при публикации поста для каждого подписчика автора,
+    поэтому лента читается одним диапазоном индекса (user, created).
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='подписчик',
+        related_name='timeline',
+        on_delete=models.CASCADE,
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='пост',
+        related_name='timeline_entries',
+        on_delete=models.CASCADE,
+    )
+    created = models.DateTimeField('дата создания поста')
+
+    class Meta:
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи ленты'
+        ordering = ('-created',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=(
+                    'user',
+                    'post',
+                ),
+                name='unique_timeline_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=(
+                    'user',
+                    'created',
+                    'post',
+                ),
+                name='timeline_user_created',
+            ),
+        ]
+
+
+class Tag(DefaultModel):
+    """Хештег, найденный в тексте поста."""
+
+    name = models.CharField('имя', max_length=50, unique=True)
+
+    class Meta:
+        verbose_name = 'хештег'
+        verbose_name_plural = 'хештеги'
+
+    def __str__(self) -> str:
+        return f'#{self.name}'
+
+
+class PostTag(DefaultModel):
+    """Связь поста с хештегом.
+
+    Дата создания поста копируется сюда, чтобы лента хештега читалась
+    одним диапазоном индекса (tag, created).
+    """
+
+    post = models.ForeignKey(
+        Post,
+        verbose_name='пост',
+        related_name='post_tags',
+        on_delete=models.CASCADE,
+    )
+    tag = models.ForeignKey(
+        Tag,
+        verbose_name='хештег',
+        related_name='post_tags',
+        on_delete=models.CASCADE,
+    )
+    created = models.DateTimeField('дата создания поста')
+
+    class Meta:
+        verbose_name = 'хештег поста'
+        verbose_name_plural = 'хештеги постов'
+        ordering = ('-created',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=(
+                    'post',
+                    'tag',
+                ),
+                name='unique_post_tag',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=(
+                    'tag',
+                    'created',
+                    'post',
+                ),
+                name='post_tag_created',
+            ),
+        ]
+
+
+class TrendingScore(DefaultModel):
+    """Свёрнутый рейтинг популярности группы или хештега.
+
+    Хранит затухающую оценку на момент updated; свежие минутные счётчики
+    лежат в кеше и добавляются к ней при расчёте.
+    """
+
+    GROUP = 'group'
+    TAG = 'tag'
+    KINDS = (
+        (GROUP, 'группа'),
+        (TAG, 'хештег'),
+    )
+
+    kind = models.CharField('тип', max_length=5, choices=KINDS)
+    object_id = models.PositiveIntegerField('объект')
+    score = models.FloatField('оценка')
+    updated = models.DateTimeField('свёрнуто до')
+
+    class Meta:
+        verbose_name = 'рейтинг популярности'
+        verbose_name_plural = 'рейтинги популярности'
+        constraints = [
+            models.UniqueConstraint(
+                fields=(
+                    'kind',
+                    'object_id',
+                ),
+                name='unique_trending_score',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.kind} {self.object_id}: {self.score:.2f}'
@@ -0,0 +1,154 @@
+import base64
+import binascii
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from django.db import connection, transaction
+
+from core.utils import (
+    CURSOR_NEXT,
+    CURSOR_SEPARATOR,
+    CursorPage,
+    CursorPaginator,
+    pk_batches,
+)
+from posts.models import Post
+
+FTS_TABLE = 'posts_post_fts'
+WORD_RE = re.compile(r'\w+')
+
+
+def available() -> bool:
+    """Показывает, есть ли у базы полнотекстовый индекс FTS5."""
+    return connection.vendor == 'sqlite'
+
+
+def index_posts(posts: Iterable[Tuple[int, str]]) -> None:
+    """Добавляет или обновляет тексты постов в индексе.
+
+    Args:
+        posts: Пары (pk, текст).
+    """
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, text) '
+            'VALUES (%s, %s)',
+            list(posts),
+        )
+
+
+def unindex_post(pk: int) -> None:
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (pk,))
+
+
+def rebuild(batch_size: int) -> int:
+    """Заново строит индекс пачками по batch_size постов.
+
+    Returns:
+        Количество проиндексированных постов.
+    """
+    if not available():
+        return 0
+    indexed = 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        for ids in pk_batches(Post.objects.all(), batch_size):
+            index_posts(
+                Post.objects.filter(pk__in=ids).values_list('pk', 'text'),
+            )
+            indexed += len(ids)
+    return indexed
+
+
+def match_expression(query: str) -> Optional[str]:
+    """Превращает пользовательский запрос в выражение MATCH.
+
+    Каждое слово берётся в кавычки, поэтому операторы FTS5 в запросе не
+    ломают синтаксис; слова объединяются через AND.
+    """
+    words = WORD_RE.findall(query)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def encode_cursor(score: float, pk: int) -> str:
+    raw = CURSOR_SEPARATOR.join((CURSOR_NEXT, repr(score), str(pk)))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[float, int]]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, score, pk = raw.decode().split(CURSOR_SEPARATOR)
+        if direction != CURSOR_NEXT:
+            return None
+        return float(score), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def _ranked(
+    expression: str,
+    position: Optional[Tuple[float, int]],
+    limit: int,
+) -> List[Tuple[int, float]]:
+    sql = (
+        f'SELECT rowid, bm25({FTS_TABLE}) AS score FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s'
+    )
+    params: List[object] = [expression]
+    if position is not None:
+        sql = (
+            f'SELECT rowid, score FROM ({sql}) '
+            'WHERE score > %s OR (score = %s AND rowid < %s)'
+        )
+        params.extend((position[0], position[0], position[1]))
+    sql += ' ORDER BY score, rowid DESC LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def search(
+    query: str,
+    cursor: Optional[str],
+    per_page: int,
+) -> CursorPage:
+    """Ищет посты по тексту.
+
+    Результаты упорядочены по релевантности bm25, затем по убыванию pk,
+    и разбиты на страницы по курсору (оценка, pk) без OFFSET. Если FTS5
+    недоступен, поиск идёт по LIKE, а страницы строятся по дате.
+
+    Args:
+        query: Строка запроса пользователя.
+        cursor: Курсор следующей страницы или None для первой.
+        per_page: Количество постов на странице.
+    """
+    posts = Post.objects.select_related('author', 'group')
+    expression = match_expression(query)
+    if expression is None:
+        return CursorPage([], None, None)
+    if not available():
+        return CursorPaginator(
+            posts.filter(text__icontains=query),
+            per_page,
+        ).page(cursor)
+    position = decode_cursor(cursor) if cursor else None
+    rows = _ranked(expression, position, per_page + 1)
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    found = posts.in_bulk([pk for pk, _ in rows])
+    return CursorPage(
+        [found[pk] for pk, _ in rows if pk in found],
+        encode_cursor(rows[-1][1], rows[-1][0]) if has_next else None,
+        None,
+    )
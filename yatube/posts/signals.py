@@ -0,0 +1,176 @@
+from typing import FrozenSet, Optional
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.cache import USER_TAG, purge
+from core.storage import is_blob_name
+from posts import counters, feeds, search, tags, timeline, trending
+from posts.cache import (
+    purge_comment,
+    purge_follow,
+    purge_group,
+    purge_post,
+    purge_user,
+)
+from posts.models import Comment, Follow, Group, Post, User
+
+NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def release_image(post: Post, name: str) -> None:
+    """Убирает ссылку поста на картинку после фиксации транзакции.
+
+    Файлы, загруженные до хранилища по содержимому, ссылок не считают и
+    не трогаются.
+    """
+    if is_blob_name(name):
+        storage = post.image.storage
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved(
+    sender: type,
+    instance: Post,
+    raw: bool = False,
+    **kwargs: object,
+) -> None:
+    """Запоминает группу и картинку поста до изменения.
+
+    Группа нужна, чтобы при переносе поста в другую группу поправить
+    счётчики обеих групп, картинка - чтобы освободить заменённый файл.
+    Новая загрузка добавляет ссылку, даже если содержимое и имя те же,
+    поэтому запоминается и то, что файл ещё не сохранён.
+    """
+    instance._image_uploaded = not instance.image._committed
+    instance._saved_group_id, instance._saved_image = (
+        Post.objects.filter(pk=instance.pk)
+        .values_list('group_id', 'image')
+        .first()
+        if instance.pk and not raw
+        else None
+    ) or (None, '')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(
+    sender: type,
+    instance: Post,
+    created: bool,
+    raw: bool = False,
+    **kwargs: object,
+) -> None:
+    if raw:
+        return
+    purge_post(instance, instance._saved_group_id)
+    search.index_posts(((instance.pk, instance.text),))
+    tags.sync((instance,))
+    if created:
+        timeline.fan_out(instance)
+        feeds.forget_author(instance.author_id)
+        counters.post_added(instance)
+        trending.post_published(instance)
+    else:
+        counters.post_moved(instance._saved_group_id, instance)
+    if (
+        instance._image_uploaded
+        or instance._saved_image != instance.image.name
+    ):
+        release_image(instance, instance._saved_image)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(
+    sender: type,
+    instance: Post,
+    **kwargs: object,
+) -> None:
+    purge_post(instance)
+    feeds.forget_author(instance.author_id)
+    counters.post_removed(instance)
+    search.unindex_post(instance.pk)
+    release_image(instance, instance.image.name)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender: type, instance: Group, **kwargs: object) -> None:
+    purge_group(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(
+    sender: type,
+    instance: Comment,
+    created: bool,
+    raw: bool = False,
+    **kwargs: object,
+) -> None:
+    if created and not raw:
+        counters.comment_changed(instance, 1)
+        purge_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(
+    sender: type,
+    instance: Comment,
+    **kwargs: object,
+) -> None:
+    counters.comment_changed(instance, -1)
+    purge_comment(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(
+    sender: type,
+    instance: Follow,
+    created: bool,
+    raw: bool = False,
+    **kwargs: object,
+) -> None:
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+        counters.follow_changed(instance, 1)
+        purge_follow(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender: type, instance: Follow, **kwargs: object) -> None:
+    timeline.purge(instance.user_id, instance.author_id)
+    counters.follow_changed(instance, -1)
+    purge_follow(instance)
+
+
+@receiver(pre_save, sender=User)
+def remember_names(
+    sender: type,
+    instance: User,
+    raw: bool = False,
+    update_fields: Optional[FrozenSet[str]] = None,
+    **kwargs: object,
+) -> None:
+    """Запоминает логин и имя пользователя до изменения.
+
+    Сохранение только last_login при входе имён не меняет и лишнего
+    запроса не делает.
+    """
+    instance._saved_names = (
+        User.objects.filter(pk=instance.pk).values_list(*NAME_FIELDS).first()
+        if instance.pk
+        and not raw
+        and (update_fields is None or update_fields & set(NAME_FIELDS))
+        else None
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender: type, instance: User, **kwargs: object) -> None:
+    purge(USER_TAG.format(pk=instance.pk))
+    saved = getattr(instance, '_saved_names', None)
+    if saved is not None and saved != tuple(
+        getattr(instance, field) for field in NAME_FIELDS
+    ):
+        purge_user(instance, saved[0])
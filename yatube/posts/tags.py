@@ -0,0 +1,86 @@
+import re
+from typing import Dict, Iterable, Set
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.query import QuerySet
+
+from posts.models import Post, PostTag, Tag
+
+ORDERING = ('created', 'post_id')
+TAG_RE = re.compile(r'(?<![\w/&#])#(\w+)')
+TAG_MAX_LENGTH = Tag._meta.get_field('name').max_length
+BATCH_SIZE = 500
+
+
+def extract(text: str) -> Set[str]:
+    """Возвращает хештеги текста в нижнем регистре без решётки.
+
+    Слишком длинные теги и решётки внутри ссылок пропускаются.
+    """
+    return {
+        name.lower()
+        for name in TAG_RE.findall(text)
+        if len(name) <= TAG_MAX_LENGTH
+    }
+
+
+def sync(posts: Iterable[Post]) -> None:
+    """Приводит связи постов с хештегами в соответствие их текстам.
+
+    Работает пачкой: недостающие хештеги и связи создаются через
+    bulk_create, лишние связи удаляются одним запросом.
+    """
+    wanted = {post.pk: (post, extract(post.text)) for post in posts}
+    if not wanted:
+        return
+    names = set().union(*(found for _, found in wanted.values()))
+    with transaction.atomic():
+        Tag.objects.bulk_create(
+            (Tag(name=name) for name in names),
+            ignore_conflicts=True,
+        )
+        tag_ids: Dict[str, int] = dict(
+            Tag.objects.filter(name__in=names).values_list('name', 'pk'),
+        )
+        existing = set(
+            PostTag.objects.filter(post_id__in=wanted).values_list(
+                'post_id',
+                'tag_id',
+            ),
+        )
+        required = {
+            (pk, tag_ids[name])
+            for pk, (_, found) in wanted.items()
+            for name in found
+        }
+        stale = existing - required
+        if stale:
+            condition = Q()
+            for post_id, tag_id in stale:
+                condition |= Q(post_id=post_id, tag_id=tag_id)
+            PostTag.objects.filter(condition).delete()
+        PostTag.objects.bulk_create(
+            (
+                PostTag(
+                    post_id=post_id,
+                    tag_id=tag_id,
+                    created=wanted[post_id][0].created,
+                )
+                for post_id, tag_id in required - existing
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+
+def feed(tag: Tag) -> QuerySet:
+    """Возвращает посты хештега от новых к старым."""
+    return (
+        PostTag.objects.filter(tag=tag)
+        .select_related(
+            'post__author',
+            'post__group',
+        )
+        .order_by('-created', '-post_id')
+    )
@@ -0,0 +1,31 @@
+from typing import Iterable, List, Match
+
+from django import template
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.safestring import SafeString, mark_safe
+
+from posts import cache
+from posts.models import Post
+from posts.tags import TAG_MAX_LENGTH, TAG_RE
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context: template.Context, posts: Iterable[Post]) -> List[str]:
+    return cache.post_cards(context['request'], posts)
+
+
+@register.filter
+def hashtags(text: str) -> SafeString:
+    """Превращает хештеги текста в ссылки на их ленты."""
+
+    def link(match: Match) -> str:
+        name = match.group(1)
+        if len(name) > TAG_MAX_LENGTH:
+            return match.group(0)
+        url = reverse('posts:tag', args=(name.lower(),))
+        return f'<a href="{url}">#{name}</a>'
+
+    return mark_safe(TAG_RE.sub(link, escape(text)))
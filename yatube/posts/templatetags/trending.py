@@ -0,0 +1,17 @@
+from typing import Dict, List
+
+from django import template
+from django.db.models import Model
+
+from posts import trending
+from posts.models import TrendingScore
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/trending.html')
+def trending_sidebar() -> Dict[str, List[Model]]:
+    return {
+        'groups': trending.top(TrendingScore.GROUP),
+        'tags': trending.top(TrendingScore.TAG),
+    }
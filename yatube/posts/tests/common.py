@@ -1,17 +1,59 @@
+import copy
+import os
+import shutil
 from io import BytesIO
+from typing import Tuple
 
+from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 from faker import Faker
 from PIL import Image
 
+THUMBNAIL_CACHE_SUFFIX = '.thumbnails'
 
-def image(name: str = Faker().bothify(text='????.gif')) -> SimpleUploadedFile:
+
+def image(
+    name: str = Faker().bothify(text='????.gif'),
+    size: Tuple[int, int] = (1, 1),
+    color: Tuple[int, ...] = (155, 0, 0),
+) -> SimpleUploadedFile:
+    """Создаёт загружаемую картинку.
+
+    Формат берётся из расширения name. JPEG рисуется в RGB, остальные
+    форматы в RGBA, так что color с нулевой альфой даёт прозрачную
+    картинку.
+    """
+    format_ = Image.registered_extensions()[os.path.splitext(name)[1].lower()]
     file = BytesIO()
-    Image.new('RGBA', size=(1, 1), color=(155, 0, 0)).save(file, 'gif')
+    Image.new(
+        'RGB' if format_ == 'JPEG' else 'RGBA',
+        size=size,
+        color=color,
+    ).save(file, format_)
     file.name = name
     file.seek(0)
     return SimpleUploadedFile(
         name=name,
         content=file.read(),
-        content_type='image/gif',
+        content_type=Image.MIME[format_],
     )
+
+
+def temp_media(media_root: str, **options: object) -> override_settings:
+    """Переносит MEDIA_ROOT и записи о миниатюрах во временные каталоги.
+
+    Файловый кеш записей лежит рядом с media_root, а не в общем каталоге
+    проекта: записи прошлых запусков указывали бы на миниатюры, которых
+    во временном MEDIA_ROOT нет. Внутрь media_root он не кладётся, чтобы
+    его файлы не видел сборщик мусора.
+    """
+    caches = copy.deepcopy(settings.CACHES)
+    caches['thumbnails']['LOCATION'] = media_root + THUMBNAIL_CACHE_SUFFIX
+    return override_settings(MEDIA_ROOT=media_root, CACHES=caches, **options)
+
+
+def remove_temp_media(media_root: str) -> None:
+    """Удаляет каталоги, созданные для temp_media."""
+    shutil.rmtree(media_root, ignore_errors=True)
+    shutil.rmtree(media_root + THUMBNAIL_CACHE_SUFFIX, ignore_errors=True)
@@ -1,14 +1,30 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from mixer.backend.django import mixer
 
-from posts.models import Post
+from core.cache import (
+    SURROGATE_KEY_HEADER,
+    _wait,
+    page_cache_stats,
+    purge,
+    tag_versions,
+)
+from posts.cache import FEED_INDEX
+from posts.models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
+# Картинки mixer настоящие, а фоновые миниатюры в TestCase не создаются:
+# on_commit не срабатывает. Страницы с заглушками не кешируются, поэтому
+# тесты кеша создают миниатюры сразу.
+sync_thumbnails = override_settings(THUMBNAIL_WORKERS=0)
+
 
+@sync_thumbnails
 class TestCache(TestCase):
     @classmethod
     def setUpClass(cls) -> None:
@@ -16,28 +32,365 @@ class TestCache(TestCase):
         cls.user = mixer.blend(User)
 
     def setUp(self) -> None:
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
+    def index(self) -> bytes:
+        return self.authorized_client.get(reverse('posts:index')).content
+
     def test_index_cache(self) -> None:
         """Проверка доступности кеша index."""
-        new_post = mixer.blend(Post, author=self.user)
-        response_before_deleting = self.authorized_client.get(
-            reverse('posts:index'),
+        post = mixer.blend(Post, author=self.user)
+        response_before_update = self.index()
+        Post.objects.filter(pk=post.pk).update(text='обновлено без сигналов')
+        self.assertEqual(self.index(), response_before_update)
+        cache.clear()
+        self.assertNotEqual(self.index(), response_before_update)
+
+    def test_new_post_invalidates_index(self) -> None:
+        """Новый пост сразу появляется на закешированной главной."""
+        self.index()
+        post = mixer.blend(Post, author=self.user)
+        self.assertIn(post.text.encode(), self.index())
+
+    def test_deleted_post_invalidates_index(self) -> None:
+        """Удалённый пост сразу пропадает с закешированной главной."""
+        post = mixer.blend(Post, author=self.user)
+        self.assertIn(post.text.encode(), self.index())
+        post.delete()
+        self.assertNotIn(post.text.encode(), self.index())
+
+    def test_group_change_purges_index(self) -> None:
+        """Изменение группы сбрасывает ключ главной ленты."""
+        before = tag_versions((FEED_INDEX,))[FEED_INDEX]
+        mixer.blend(Group)
+        self.assertGreater(tag_versions((FEED_INDEX,))[FEED_INDEX], before)
+
+    def test_unchanged_index_is_not_rebuilt(self) -> None:
+        """Без изменений главная отдаётся из кеша без запросов к базе."""
+        self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('posts:index'))
+
+    def test_cached_index_reads_only_current_user(self) -> None:
+        """Пользователю из кеша нужны только сессия и сам пользователь."""
+        self.index()
+        with self.assertNumQueries(2):
+            self.index()
+
+
+@sync_thumbnails
+class TestSurrogateKeys(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = mixer.blend(User)
+        cls.group, cls.other_group = mixer.cycle(2).blend(Group)
+        cls.post = mixer.blend(Post, author=cls.author, group=cls.group)
+        cls.other_post = mixer.blend(Post, author=cls.author)
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def get(self, name: str, *args: object) -> bytes:
+        return self.client.get(reverse(name, args=args)).content
+
+    def test_surrogate_key_header(self) -> None:
+        """Ответ помечается суррогатными ключами."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)),
         )
-        new_post.delete()
-        response_after_deleting = self.authorized_client.get(
-            reverse('posts:index'),
+        self.assertEqual(
+            response[SURROGATE_KEY_HEADER],
+            f'author:{self.author.username} post:{self.post.pk}',
+        )
+
+    def test_edit_purges_affected_pages(self) -> None:
+        """Правка поста сбрасывает его страницу, группу и профиль."""
+        pages = (
+            ('posts:post_detail', self.post.pk),
+            ('posts:group_list', self.group.slug),
+            ('posts:profile', self.author.username),
+        )
+        for page in pages:
+            self.get(*page)
+        self.post.text = 'новый текст поста'
+        self.post.save()
+        for page in pages:
+            with self.subTest(page=page):
+                self.assertIn(self.post.text.encode(), self.get(*page))
+
+    def test_move_purges_old_group(self) -> None:
+        """Перенос поста сбрасывает страницу старой группы."""
+        self.get('posts:group_list', self.group.slug)
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertNotIn(
+            self.post.text.encode(),
+            self.get('posts:group_list', self.group.slug),
+        )
+
+    def test_comment_purges_only_its_post(self) -> None:
+        """Комментарий сбрасывает только страницу своего поста."""
+        self.get('posts:post_detail', self.post.pk)
+        self.get('posts:post_detail', self.other_post.pk)
+        comment = mixer.blend(Comment, post=self.post)
+        self.assertIn(
+            comment.text.encode(),
+            self.get('posts:post_detail', self.post.pk),
+        )
+        # Остаётся только поиск автора для ETag и Last-Modified.
+        with self.assertNumQueries(1):
+            self.get('posts:post_detail', self.other_post.pk)
+
+    def test_rename_purges_author_pages(self) -> None:
+        """Смена имени автора сбрасывает страницы с его карточками."""
+        pages = (
+            ('posts:index',),
+            ('posts:post_detail', self.post.pk),
+            ('posts:group_list', self.group.slug),
+            ('posts:profile', self.author.username),
+        )
+        etags = {
+            page: self.client.get(reverse(page[0], args=page[1:]))['ETag']
+            for page in pages
+        }
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name, author.last_name = 'Новое', 'Имя'
+        author.save()
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.client.get(reverse(page[0], args=page[1:]))
+                self.assertContains(response, 'Новое Имя')
+                self.assertNotEqual(response['ETag'], etags[page])
+
+    def test_commenter_rename_purges_post(self) -> None:
+        """Смена логина комментатора сбрасывает страницу поста."""
+        commenter = mixer.blend(User)
+        mixer.blend(Comment, post=self.post, author=commenter)
+        self.get('posts:post_detail', self.post.pk)
+        commenter.username = 'renamed_commenter'
+        commenter.save()
+        self.assertIn(
+            b'renamed_commenter',
+            self.get('posts:post_detail', self.post.pk),
         )
+
+    def test_login_does_not_purge_author_pages(self) -> None:
+        """Вход пользователя не сбрасывает страницы с его постами."""
+        before = tag_versions((FEED_INDEX,))
+        self.client.force_login(self.author)
+        self.assertEqual(tag_versions((FEED_INDEX,)), before)
+
+
+@sync_thumbnails
+class TestStaleWhileRevalidate(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.post = mixer.blend(Post)
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def index(self) -> bytes:
+        return self.client.get(reverse('posts:index')).content
+
+    def test_stale_served_while_locked(self) -> None:
+        """Пока страницу перестраивает другой процесс, отдаётся старая."""
+        stale = self.index()
+        new_post = mixer.blend(Post)
+        with mock.patch('core.cache.acquire', return_value=False):
+            self.assertEqual(self.index(), stale)
+        self.assertEqual(page_cache_stats()['stale'], 1)
+        self.assertIn(new_post.text.encode(), self.index())
+
+    def test_stats(self) -> None:
+        """Попадания и промахи учитываются в счётчиках."""
+        self.index()
+        self.index()
         self.assertEqual(
-            response_before_deleting.content,
-            response_after_deleting.content,
+            page_cache_stats(),
+            {'hit': 1, 'stale': 0, 'miss': 1},
         )
+
+    @override_settings(PAGE_CACHE_LOCK_TIMEOUT=0)
+    def test_miss_without_lock_renders(self) -> None:
+        """Промах без блокировки и без готовой страницы всё равно отвечает."""
+        with mock.patch('core.cache.acquire', return_value=False):
+            self.assertIn(self.post.text.encode(), self.index())
+
+    def test_released_lock_stops_waiting(self) -> None:
+        """Снятая без записи в кеш блокировка прекращает ожидание."""
+        with mock.patch('core.cache.time.sleep') as sleep:
+            self.assertIsNone(_wait('missing', 'missing-lock'))
+        self.assertEqual(sleep.call_count, 1)
+
+
+@sync_thumbnails
+class TestSharedPages(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author, cls.reader = mixer.cycle(2).blend(User)
+        mixer.blend(Post, author=cls.author)
+
+    def setUp(self) -> None:
         cache.clear()
-        response_after_cleaning_cahe = self.authorized_client.get(
-            reverse('posts:index'),
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_page_is_rendered_once_for_all_users(self) -> None:
+        """Главная рисуется один раз, шапка у каждого своя."""
+        author_page = self.author_client.get(reverse('posts:index'))
+        reader_page = self.reader_client.get(reverse('posts:index'))
+        self.assertEqual(page_cache_stats()['hit'], 1)
+        self.assertContains(author_page, self.author.username)
+        self.assertContains(reader_page, self.reader.username)
+        self.assertNotContains(reader_page, '<!--fragment:')
+
+    def test_cache_control(self) -> None:
+        """Анонимный ответ публичный, ответ пользователю приватный."""
+        anonymous = self.client.get(reverse('posts:index'))
+        authorized = self.reader_client.get(reverse('posts:index'))
+        self.assertIn('public', anonymous['Cache-Control'])
+        self.assertIn('s-maxage', anonymous['Cache-Control'])
+        self.assertIn('private', authorized['Cache-Control'])
+
+    def test_follow_button_follows_subscription(self) -> None:
+        """Кнопка подписки меняется сразу, хотя профиль в кеше."""
+        url = reverse('posts:profile', args=(self.author.username,))
+        follow_url = reverse(
+            'posts:profile_follow',
+            args=(self.author.username,),
         )
-        self.assertNotEqual(
-            response_after_deleting.content,
-            response_after_cleaning_cahe.content,
+        unfollow_url = reverse(
+            'posts:profile_unfollow',
+            args=(self.author.username,),
         )
+        self.assertContains(self.reader_client.get(url), follow_url)
+        Follow.objects.create(user=self.reader, author=self.author)
+        page = self.reader_client.get(url)
+        self.assertContains(page, unfollow_url)
+        self.assertNotContains(self.author_client.get(url), follow_url)
+
+
+@sync_thumbnails
+class TestConditionalGet(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = mixer.blend(User)
+        cls.post = mixer.blend(Post, author=cls.user)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_unchanged_page_is_not_modified(self) -> None:
+        """Без изменений страницы отвечают 304 без запросов к базе."""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.user.username,)),
+        ):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self) -> None:
+        """Last-Modified принимается как If-Modified-Since."""
+        url = reverse('posts:index')
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_change_breaks_etag(self) -> None:
+        """Комментарий меняет ETag страницы поста."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        etag = self.client.get(url)['ETag']
+        mixer.blend(Comment, post=self.post)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_stale_page_has_no_validators(self) -> None:
+        """Устаревшая страница не получает ETag новых версий."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        new_post = mixer.blend(Post)
+        with mock.patch('core.cache.acquire', return_value=False):
+            stale = self.client.get(url)
+        self.assertNotContains(stale, new_post.text)
+        self.assertFalse(stale.has_header('ETag'))
+        self.assertFalse(stale.has_header('Last-Modified'))
+        self.assertNotIn('public', stale.get('Cache-Control', ''))
+        fresh = self.client.get(url)
+        self.assertContains(fresh, new_post.text)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=fresh['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_user(self) -> None:
+        """Пользователь не получает 304 на анонимную версию страницы."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@sync_thumbnails
+class TestPostCards(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = mixer.blend(User)
+        cls.group = mixer.blend(Group)
+        cls.posts = mixer.cycle(3).blend(
+            Post,
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def index(self) -> bytes:
+        purge(FEED_INDEX)
+        return self.client.get(reverse('posts:index')).content
+
+    def test_cards_survive_page_rebuild(self) -> None:
+        """Перестроенная главная берёт неизменённые карточки из кеша."""
+        post = self.posts[0]
+        old_text = post.text
+        self.index()
+        Post.objects.filter(pk=post.pk).update(text='обновлено без сигналов')
+        self.assertIn(old_text.encode(), self.index())
+
+    def test_saved_post_gets_new_card(self) -> None:
+        """Сохранение поста меняет ключ его карточки."""
+        post = self.posts[0]
+        self.index()
+        post.text = 'новый текст'
+        post.save()
+        self.assertIn(post.text.encode(), self.index())
+
+    def test_cards_depend_on_view(self) -> None:
+        """На странице группы карточка не ссылается на эту группу."""
+        group_url = reverse('posts:group_list', args=(self.group.slug,))
+        self.client.get(reverse('posts:index'))
+        self.assertNotContains(self.client.get(group_url), group_url)
+
+    def test_cards_read_with_one_get_many(self) -> None:
+        """Все карточки страницы читаются одним обращением к кешу."""
+        self.index()
+        with mock.patch(
+            'posts.cache.cache.get_many',
+            wraps=cache.get_many,
+        ) as get_many:
+            self.index()
+        card_reads = [
+            call
+            for call in get_many.call_args_list
+            if len(call.args[0]) == len(self.posts)
+        ]
+        self.assertEqual(len(card_reads), 1)
@@ -0,0 +1,104 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from posts.counters import author_stats
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author, cls.follower = mixer.blend(User), mixer.blend(User)
+        cls.group, cls.other_group = mixer.cycle(2).blend(Group)
+
+    def test_post_counters(self) -> None:
+        """Создание, перенос и удаление поста меняют счётчики."""
+        author_stats(self.author.pk)
+        post = mixer.blend(Post, author=self.author, group=self.group)
+        self.assertEqual(author_stats(self.author.pk).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(author_stats(self.author.pk).posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_comment_counter(self) -> None:
+        """Комментарии увеличивают счётчик поста."""
+        post = mixer.blend(Post)
+        comment = mixer.blend(Comment, post=post)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_save_keeps_concurrent_increments(self) -> None:
+        """Сохранение прочитанной ранее записи не затирает счётчики."""
+        post = mixer.blend(Post, author=self.author, group=self.group)
+        group = Group.objects.get(pk=self.group.pk)
+        stale = Post.objects.get(pk=post.pk)
+        mixer.blend(Comment, post=post)
+        mixer.blend(Post, author=self.author, group=self.group)
+        stale.text = 'исправленный текст'
+        stale.save()
+        group.title = 'новый заголовок'
+        group.save()
+        post.refresh_from_db()
+        group.refresh_from_db()
+        self.assertEqual(post.text, 'исправленный текст')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(group.title, 'новый заголовок')
+        self.assertEqual(group.posts_count, 2)
+
+    def test_follow_counters(self) -> None:
+        """Подписка меняет счётчики обеих сторон."""
+        follow = Follow.objects.create(user=self.follower, author=self.author)
+        self.assertEqual(author_stats(self.author.pk).followers_count, 1)
+        self.assertEqual(author_stats(self.follower.pk).following_count, 1)
+        follow.delete()
+        self.assertEqual(author_stats(self.author.pk).followers_count, 0)
+        self.assertEqual(author_stats(self.follower.pk).following_count, 0)
+
+    def test_profile_reads_stored_counters(self) -> None:
+        """Страница профиля читает готовые счётчики без COUNT(*)."""
+        mixer.blend(Post, author=self.author)
+        Follow.objects.create(user=self.follower, author=self.author)
+        cache.clear()
+        url = reverse('posts:profile', args=(self.author.username,))
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.context['stats'].posts_count, 1)
+        self.assertEqual(response.context['stats'].followers_count, 1)
+
+    def test_recount_command(self) -> None:
+        """Команда recount исправляет расхождения счётчиков."""
+        post = mixer.blend(Post, author=self.author, group=self.group)
+        mixer.blend(Comment, post=post)
+        AuthorStats.objects.filter(user=self.author).update(posts_count=42)
+        Group.objects.update(posts_count=42)
+        Post.objects.update(comments_count=42)
+
+        call_command('recount', batch_size=1, stdout=StringIO())
+
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(author_stats(self.author.pk).posts_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
@@ -0,0 +1,99 @@
+from typing import List, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.test import TestCase, override_settings
+from mixer.backend.django import mixer
+
+from core.utils import CursorPage
+from posts.feeds import merged_page
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+AUTHORS_AMMOUNT = 3
+POSTS_PER_AUTHOR = 7
+
+
+@override_settings(FOLLOW_MERGE_THRESHOLD=1)
+class MergedFeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.follower = mixer.blend(User)
+        for author in mixer.cycle(AUTHORS_AMMOUNT).blend(User):
+            Follow.objects.create(user=cls.follower, author=author)
+            mixer.cycle(POSTS_PER_AUTHOR).blend(Post, author=author)
+        mixer.cycle(POSTS_PER_AUTHOR).blend(Post)
+        cls.expected = list(
+            Post.objects.filter(
+                author__following__user=cls.follower,
+            ).order_by('-created', '-pk'),
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def walk(self, cursor: Optional[str] = None) -> List[Post]:
+        """Обходит ленту вперёд, пока слияние может ответить."""
+        seen: List[Post] = []
+        while True:
+            page = merged_page(self.follower, cursor, per_page=4)
+            if page is None:
+                return seen
+            seen.extend(page)
+            if not page.has_next():
+                return seen
+            cursor = page.next_cursor
+
+    def test_merge_matches_join(self) -> None:
+        """Слияние списков авторов совпадает с сортировкой в базе."""
+        self.assertEqual(self.walk(), self.expected)
+
+    def test_previous_page(self) -> None:
+        """Курсор назад возвращает предыдущую страницу слияния."""
+        first = merged_page(self.follower, None, per_page=4)
+        second = merged_page(self.follower, first.next_cursor, per_page=4)
+        self.assertEqual(
+            list(merged_page(self.follower, second.previous_cursor, 4)),
+            list(first),
+        )
+
+    @override_settings(FOLLOW_MERGE_DEPTH=2)
+    def test_truncated_lists_fall_back(self) -> None:
+        """За пределами закешированных списков слияние уступает таблице."""
+        seen = self.walk()
+        self.assertLess(len(seen), len(self.expected))
+        self.assertEqual(seen, self.expected[: len(seen)])
+
+    def test_new_post_resets_author_list(self) -> None:
+        """Новый пост автора сразу виден в слиянии."""
+        merged_page(self.follower, None)
+        new_post = mixer.blend(Post, author=self.expected[0].author)
+        self.assertEqual(merged_page(self.follower, None)[0], new_post)
+
+    def test_view_uses_merge(self) -> None:
+        """Лента подписок отдаёт страницу слияния выше порога."""
+        self.client.force_login(self.follower)
+        page = self.client.get('/follow/').context['page_obj']
+        self.assertEqual(list(page), self.expected[: settings.PAGE_SIZE])
+        self.assertTrue(page.has_next())
+
+    def test_page_number_uses_paginator(self) -> None:
+        """Номер страницы выше порога по-прежнему листает страницы."""
+        self.client.force_login(self.follower)
+        page = self.client.get('/follow/?page=2').context['page_obj']
+        self.assertIsInstance(page, Page)
+        self.assertEqual(page.number, 2)
+        size = settings.PAGE_SIZE
+        self.assertEqual(list(page), self.expected[size:][:size])
+
+    @override_settings(FOLLOW_MERGE_DEPTH=2)
+    def test_fallback_keeps_cursor_links(self) -> None:
+        """Страница из таблицы ленты после слияния тоже курсорная."""
+        self.client.force_login(self.follower)
+        page = self.client.get('/follow/').context['page_obj']
+        self.assertIsInstance(page, CursorPage)
+        self.assertEqual(list(page), self.expected[: settings.PAGE_SIZE])
+        self.assertTrue(page.has_next())
@@ -1,6 +1,6 @@
 import shutil
 import tempfile
-from typing import Dict, Union
+from typing import Dict, Tuple, Union
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -9,6 +9,7 @@ from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from faker import Faker
 from mixer.backend.django import mixer
+from PIL import Image
 
 from posts.models import Comment, Follow, Group, Post
 from posts.tests.common import image
@@ -53,9 +54,9 @@ class TestPostForm(TestCase):
             'author_id': self.author.pk,
             'pk': response.context['post'].pk,
         }
-        self.assertTrue(
-            response.context['post'].image.name.endswith(data['image'].name),
-        )
+        data['image'].seek(0)
+        with post.image.open() as stored:
+            self.assertEqual(stored.read(), data['image'].read())
         for value, expected in value_expected.items():
             with self.subTest(value=expected):
                 self.assertEqual(getattr(post, value), expected)
@@ -155,6 +156,35 @@ class TestPostForm(TestCase):
             new_form_data['text'],
         )
 
+    def create_with_image(self, size: Tuple[int, int]) -> HttpResponse:
+        return self.author_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': Faker().bothify(),
+                'image': image('big.jpg', size=size),
+            },
+        )
+
+    @override_settings(IMAGE_MAX_SIDE=40)
+    def test_large_image_downscaled(self) -> None:
+        """Слишком большая картинка уменьшается до сохранения."""
+        self.create_with_image((400, 100))
+        with Image.open(Post.objects.get().image) as stored:
+            self.assertEqual(stored.size, (40, 10))
+            self.assertEqual(stored.format, 'JPEG')
+
+    @override_settings(IMAGE_MAX_PIXELS=10**6)
+    def test_too_many_pixels(self) -> None:
+        """Картинка с лишними пикселями не принимается."""
+        response = self.create_with_image((2000, 600))
+        self.assertFormError(
+            response,
+            'form',
+            'image',
+            'Слишком большая картинка: больше 1 Мп.',
+        )
+        self.assertFalse(Post.objects.exists())
+
 
 class TestCommentForm(TestCase):
     @classmethod
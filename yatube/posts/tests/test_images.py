@@ -0,0 +1,186 @@
+import os
+import tempfile
+from io import StringIO
+from typing import Callable, Iterator, Tuple
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from mixer.backend.django import mixer
+from sorl.thumbnail import get_thumbnail
+
+from core import garbage, thumbnails
+from core.garbage import walk
+from core.models import Blob
+from core.storage import is_blob_name
+from posts.models import Post
+from posts.tests.common import image, remove_temp_media, temp_media
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def run_on_commit(callback: Callable[[], None]) -> None:
+    callback()
+
+
+@temp_media(TEMP_MEDIA_ROOT)
+@mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+class ImagesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = mixer.blend(User)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        remove_temp_media(TEMP_MEDIA_ROOT)
+
+    def post(self, content: bytes) -> Post:
+        post = Post(author=self.author, text='пост')
+        post.image.save('photo.jpg', ContentFile(content))
+        return post
+
+    def test_replace_and_delete_release_blob(self) -> None:
+        """Замена картинки и удаление поста освобождают ссылки."""
+        first, second = self.post(b'same'), self.post(b'same')
+        name = first.image.name
+        self.assertEqual(Blob.objects.get(name=name).references, 2)
+        first.image.save('other.jpg', ContentFile(b'other'))
+        self.assertEqual(Blob.objects.get(name=name).references, 1)
+        second.delete()
+        self.assertFalse(Blob.objects.filter(name=name).exists())
+        self.assertFalse(first.image.storage.exists(name))
+
+    def test_same_upload_keeps_one_reference(self) -> None:
+        """Повторная загрузка той же картинки не оставляет лишней ссылки."""
+        post = self.post(b'same')
+        name = post.image.name
+        post.image = ContentFile(b'same', name='again.jpg')
+        post.save()
+        self.assertEqual(post.image.name, name)
+        self.assertEqual(Blob.objects.get(name=name).references, 1)
+        post.delete()
+        self.assertFalse(Blob.objects.filter(name=name).exists())
+
+    def test_migrate_images(self) -> None:
+        """Команда переносит старые файлы и удаляет исходники."""
+        legacy = FileSystemStorage()
+        names = [
+            legacy.save('posts/old.jpg', ContentFile(b'legacy'))
+            for _ in range(3)
+        ]
+        for name in names:
+            Post.objects.create(author=self.author, text='старый', image=name)
+        Post.objects.create(
+            author=self.author,
+            text='потерянный',
+            image='posts/missing.jpg',
+        )
+        out = StringIO()
+        call_command('migrate_images', batch_size=2, stdout=out)
+        self.assertIn('Перенесено картинок: 3', out.getvalue())
+        self.assertIn('Файлы не найдены: 1', out.getvalue())
+        migrated = set(
+            Post.objects.exclude(image='posts/missing.jpg').values_list(
+                'image',
+                flat=True,
+            ),
+        )
+        self.assertEqual(len(migrated), 1)
+        name = migrated.pop()
+        self.assertTrue(is_blob_name(name))
+        self.assertEqual(Blob.objects.get(name=name).references, 3)
+        for old in names:
+            self.assertFalse(legacy.exists(old))
+
+    def test_migrate_images_resumes(self) -> None:
+        """Перенос продолжается с поста из файла состояния."""
+        legacy = FileSystemStorage()
+        posts = [
+            Post.objects.create(
+                author=self.author,
+                text='старый',
+                image=legacy.save('posts/old.jpg', ContentFile(str(i))),
+            )
+            for i in range(3)
+        ]
+        state_file = os.path.join(TEMP_MEDIA_ROOT, 'migrate.state')
+        with open(state_file, 'w') as state:
+            state.write(str(posts[0].pk))
+        out = StringIO()
+        call_command(
+            'migrate_images',
+            batch_size=1,
+            state_file=state_file,
+            stdout=out,
+        )
+        self.assertIn('Перенесено картинок: 2', out.getvalue())
+        self.assertFalse(os.path.exists(state_file))
+        for post, migrated in zip(posts, (False, True, True)):
+            post.refresh_from_db()
+            self.assertEqual(is_blob_name(post.image.name), migrated)
+
+    def test_collect_media_keeps_new_reference(self) -> None:
+        """Ссылка, появившаяся после проверки сборщика, спасает файл."""
+        post = self.post(b'raced')
+        name = post.image.name
+        Post.objects.filter(pk=post.pk).update(image='')
+        Blob.objects.filter(name=name).update(references=0)
+        real_garbage = garbage._garbage
+
+        def garbage_then_upload(*args: object) -> Iterator[Tuple[str, bool]]:
+            found = list(real_garbage(*args))
+            self.post(b'raced')
+            return iter(found)
+
+        with mock.patch('core.garbage._garbage', garbage_then_upload):
+            call_command('collect_media', min_age=0, stdout=StringIO())
+        self.assertTrue(os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name)))
+        self.assertEqual(Blob.objects.get(name=name).references, 1)
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_collect_media(self) -> None:
+        """Сборщик удаляет только файлы без ссылок."""
+        post = Post(author=self.author, text='живой')
+        post.image.save('photo.jpg', image('photo.jpg', size=(2, 2)))
+        thumbnails.pregenerate(post.image)
+        legacy = FileSystemStorage()
+        orphan = legacy.save(
+            'posts/orphan.jpg',
+            image('orphan.jpg', size=(2, 2)),
+        )
+        orphan_thumbnail = get_thumbnail(orphan, '100x100').name
+        temporary = legacy.save('tmp/upload', ContentFile(b'partial'))
+        live = {
+            thumbnail.name
+            for thumbnail in thumbnails.ready_thumbnails(
+                post.image,
+                thumbnails.pregenerated(),
+            )[0]
+        }
+        garbage = {orphan, orphan_thumbnail, temporary}
+
+        out = StringIO()
+        call_command('collect_media', min_age=0, dry_run=True, stdout=out)
+        for name in garbage:
+            self.assertIn(name, out.getvalue())
+            self.assertTrue(legacy.exists(name))
+
+        call_command('collect_media', min_age=0, stdout=StringIO())
+        for name in garbage:
+            self.assertFalse(legacy.exists(name))
+        self.assertTrue(legacy.exists(post.image.name))
+        self.assertEqual(
+            {
+                name
+                for name, _ in walk(settings.MEDIA_ROOT)
+                if name.startswith('cache/')
+            },
+            live,
+        )
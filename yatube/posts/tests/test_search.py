@@ -0,0 +1,75 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = mixer.blend(User)
+        cls.cat = Post.objects.create(
+            author=cls.author,
+            text='Кот спит на диване',
+        )
+        cls.cats = Post.objects.create(
+            author=cls.author,
+            text='Кот и кот: два кота',
+        )
+        cls.dog = Post.objects.create(
+            author=cls.author,
+            text='Собака гуляет',
+        )
+
+    def find(self, query: str) -> list:
+        return list(search.search(query, None, 10))
+
+    def test_ranked_results(self) -> None:
+        """Найденные посты упорядочены по релевантности."""
+        self.assertEqual(self.find('кот'), [self.cats, self.cat])
+        self.assertEqual(self.find('собака'), [self.dog])
+
+    def test_signals_keep_index(self) -> None:
+        """Изменение и удаление поста сразу видны в поиске."""
+        self.dog.text = 'Кошка гуляет'
+        self.dog.save()
+        self.assertEqual(self.find('собака'), [])
+        self.assertEqual(self.find('кошка'), [self.dog])
+        self.dog.delete()
+        self.assertEqual(self.find('кошка'), [])
+
+    def test_operators_are_words(self) -> None:
+        """Служебные символы FTS5 в запросе не ломают поиск."""
+        self.assertEqual(self.find('кот" *('), [self.cats, self.cat])
+        self.assertEqual(self.find('кот OR собака'), [])
+        self.assertEqual(self.find('!!!'), [])
+
+    def test_keyset_pages(self) -> None:
+        """Курсор ведёт на следующую страницу без повторов."""
+        first = search.search('кот', None, 1)
+        second = search.search('кот', first.next_cursor, 1)
+        self.assertEqual(list(first) + list(second), [self.cats, self.cat])
+        self.assertIsNone(second.next_cursor)
+
+    @override_settings(PAGE_SIZE=1)
+    def test_view(self) -> None:
+        """Страница поиска показывает результаты и ссылку дальше."""
+        response = self.client.get(reverse('posts:search'), {'q': 'кот'})
+        self.assertEqual(list(response.context['page_obj']), [self.cats])
+        self.assertContains(response, '?q=')
+
+    def test_rebuild(self) -> None:
+        """Команда заново строит индекс пачками."""
+        Post.objects.filter(pk=self.dog.pk).update(text='Кошка гуляет')
+        out = StringIO()
+        call_command('rebuild_search', batch_size=2, stdout=out)
+        self.assertIn('3', out.getvalue())
+        self.assertEqual(self.find('кошка'), [self.dog])
@@ -0,0 +1,82 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from posts.models import Post, PostTag, Tag
+from posts.tags import extract
+
+User = get_user_model()
+
+
+class TagsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = mixer.blend(User)
+
+    def tag_names(self, post: Post) -> set:
+        return set(
+            PostTag.objects.filter(post=post).values_list(
+                'tag__name',
+                flat=True,
+            ),
+        )
+
+    def test_extract(self) -> None:
+        """Хештеги извлекаются без ссылок и в нижнем регистре."""
+        self.assertEqual(
+            extract('#Кот и #dog_1, но не http://x.ru/#anchor и ##'),
+            {'кот', 'dog_1'},
+        )
+
+    def test_save_syncs_tags(self) -> None:
+        """Сохранение поста добавляет и убирает его хештеги."""
+        post = Post.objects.create(author=self.author, text='#кот #пёс')
+        self.assertEqual(self.tag_names(post), {'кот', 'пёс'})
+        post.text = '#кот #ёж'
+        post.save()
+        self.assertEqual(self.tag_names(post), {'кот', 'ёж'})
+        self.assertEqual(
+            PostTag.objects.get(post=post, tag__name='кот').created,
+            post.created,
+        )
+
+    @override_settings(PAGE_SIZE=1)
+    def test_tag_feed(self) -> None:
+        """Лента хештега идёт от новых постов к старым по курсору."""
+        old = Post.objects.create(author=self.author, text='старый #кот')
+        new = Post.objects.create(author=self.author, text='новый #Кот')
+        Post.objects.create(author=self.author, text='без тегов')
+        url = reverse('posts:tag', args=('кот',))
+        first = self.client.get(url)
+        self.assertEqual(list(first.context['page_obj']), [new])
+        second = self.client.get(
+            url,
+            {'cursor': first.context['page_obj'].next_cursor},
+        )
+        self.assertEqual(list(second.context['page_obj']), [old])
+        self.assertEqual(
+            self.client.get(reverse('posts:tag', args=('нет',))).status_code,
+            404,
+        )
+
+    def test_cards_link_tags(self) -> None:
+        """Хештеги в тексте карточки ведут на ленты."""
+        Post.objects.create(author=self.author, text='про #Кот')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response,
+            f'<a href="{reverse("posts:tag", args=("кот",))}">#Кот</a>',
+        )
+
+    def test_backfill(self) -> None:
+        """Команда находит хештеги у постов, созданных без сигналов."""
+        post = Post.objects.create(author=self.author, text='текст')
+        Post.objects.filter(pk=post.pk).update(text='#поздний тег')
+        out = StringIO()
+        call_command('backfill_tags', chunk_size=1, stdout=out)
+        self.assertEqual(self.tag_names(post), {'поздний'})
+        self.assertTrue(Tag.objects.filter(name='поздний').exists())
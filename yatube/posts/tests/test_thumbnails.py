@@ -0,0 +1,211 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from mixer.backend.django import mixer
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from core import thumbnails
+from core.cache import page_cache_stats
+from posts.models import Post
+from posts.tests.common import image, remove_temp_media, temp_media
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+GEOMETRY, OPTIONS = settings.THUMBNAIL_PREGENERATE[0]
+
+
+@temp_media(TEMP_MEDIA_ROOT)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = mixer.blend(User)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        remove_temp_media(TEMP_MEDIA_ROOT)
+
+    def setUp(self) -> None:
+        cache.clear()
+        caches[settings.THUMBNAIL_CACHE].clear()
+        shutil.rmtree(
+            os.path.join(TEMP_MEDIA_ROOT, thumbnail_settings.THUMBNAIL_PREFIX),
+            ignore_errors=True,
+        )
+        self.post = Post.objects.create(
+            author=self.author,
+            text='пост с картинкой',
+            image=image('photo.jpg', size=(2, 2)),
+        )
+
+    def cached(self) -> object:
+        return default.backend.cached_thumbnail(
+            self.post.image,
+            GEOMETRY,
+            **OPTIONS,
+        )
+
+    def test_placeholder_until_ready(self) -> None:
+        """Пока миниатюра создаётся, страница показывает заглушку."""
+        with mock.patch('core.thumbnails.pregenerate') as pregenerate:
+            response = self.client.get(reverse('posts:index'))
+            self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertEqual(page_cache_stats()['miss'], 2)
+        pregenerate.assert_not_called()
+        self.assertIsNone(self.cached())
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_pregenerate(self) -> None:
+        """После генерации страница показывает готовую миниатюру."""
+        thumbnails.pregenerate(self.post.image)
+        thumbnail = self.cached()
+        self.assertIsNotNone(thumbnail)
+        self.assertContains(
+            self.client.get(reverse('posts:index')),
+            thumbnail.url,
+        )
+
+    def test_upload_queues_generation(self) -> None:
+        """Создание поста ставит миниатюры в очередь после фиксации."""
+        client = Client()
+        client.force_login(self.author)
+        with mock.patch('posts.views.transaction.on_commit') as on_commit:
+            client.post(
+                reverse('posts:post_create'),
+                {'text': 'ещё пост', 'image': image('photo.jpg', size=(2, 2))},
+            )
+        with mock.patch('core.thumbnails.pregenerate') as pregenerate:
+            on_commit.call_args.args[0]()
+        post = Post.objects.latest('pk')
+        pregenerate.assert_called_once_with(post.image)
+
+    def test_lost_record_restored_from_file(self) -> None:
+        """После сброса кеша готовая миниатюра не заменяется заглушкой."""
+        with self.settings(THUMBNAIL_WORKERS=0):
+            thumbnails.pregenerate(self.post.image)
+        cache.clear()
+        with mock.patch('core.thumbnails.pregenerate') as pregenerate:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<picture>')
+        self.assertNotContains(response, 'aspect-ratio: 960 / 339')
+        self.assertEqual(page_cache_stats()['miss'], 1)
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(page_cache_stats()['hit'], 1)
+        pregenerate.assert_not_called()
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_transparent_source(self) -> None:
+        """Прозрачная картинка получает все варианты, включая JPEG."""
+        post = Post.objects.create(
+            author=self.author,
+            text='прозрачная картинка',
+            image=image('photo.gif', size=(2, 2), color=(155, 0, 0, 0)),
+        )
+        thumbnails.pregenerate(post.image)
+        for geometry, options in thumbnails.pregenerated():
+            thumbnail = default.backend.cached_thumbnail(
+                post.image,
+                geometry,
+                **options,
+            )
+            self.assertIsNotNone(thumbnail, options['format'])
+            with Image.open(thumbnail.storage.open(thumbnail.name)) as made:
+                self.assertEqual(made.format, options['format'])
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_kvstore_in_cache(self) -> None:
+        """Сведения о миниатюрах хранятся в файловом кеше, а не в базе."""
+        thumbnails.pregenerate(self.post.image)
+        cache.clear()
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(self.cached())
+
+    def test_background_pool(self) -> None:
+        """Фоновый пул создаёт все варианты и снимает отметку очереди."""
+        thumbnails.pregenerate(self.post.image)
+        pending = thumbnails.PENDING_KEY.format(self.post.image.name)
+        deadline = time.monotonic() + 10
+        while cache.get(pending) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertIsNone(cache.get(pending))
+        for geometry, options in thumbnails.pregenerated():
+            self.assertIsNotNone(
+                default.backend.cached_thumbnail(
+                    self.post.image,
+                    geometry,
+                    **options,
+                ),
+            )
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_feed_prefetches_thumbnails(self) -> None:
+        """Миниатюры ленты читаются одним запросом к кешу."""
+        posts = [self.post] + [
+            Post.objects.create(
+                author=self.author,
+                text='ещё',
+                image=image('photo.jpg', size=(2, 2)),
+            )
+            for _ in range(2)
+        ]
+        for post in posts:
+            thumbnails.pregenerate(post.image)
+        with mock.patch.object(
+            default.kvstore,
+            '_get_raw',
+            wraps=default.kvstore._get_raw,
+        ) as get_raw:
+            response = self.client.get(reverse('posts:index'))
+        get_raw.assert_not_called()
+        for post in posts:
+            self.assertContains(
+                response,
+                default.backend.cached_thumbnail(
+                    post.image,
+                    GEOMETRY,
+                    **OPTIONS,
+                ).url,
+            )
+
+    def test_variants(self) -> None:
+        """Варианты строятся по ширинам и форматам с сохранением пропорций."""
+        with self.settings(THUMBNAIL_WIDTHS=(480, 1200)):
+            self.assertEqual(
+                thumbnails.variants('960x339', crop='center'),
+                (
+                    ('480x170', {'crop': 'center', 'format': 'WEBP'}),
+                    ('960x339', {'crop': 'center', 'format': 'WEBP'}),
+                    ('480x170', {'crop': 'center', 'format': 'JPEG'}),
+                    ('960x339', {'crop': 'center', 'format': 'JPEG'}),
+                ),
+            )
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_responsive_image(self) -> None:
+        """Лента отдаёт srcset в WebP и JPEG с размерами и loading=lazy."""
+        feed = self.client.get(reverse('posts:index'))
+        detail = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+        for response in (feed, detail):
+            self.assertContains(response, '<source type="image/webp"')
+            self.assertContains(response, 'width="960"')
+            self.assertContains(response, 'height="339"')
+            for width in settings.THUMBNAIL_WIDTHS:
+                self.assertContains(response, f' {width}w', count=2)
+        self.assertContains(feed, 'loading="lazy"')
+        self.assertNotContains(detail, 'loading="lazy"')
@@ -0,0 +1,79 @@
+from typing import List
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+PAGES_AMMOUNT = 3
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.follower, cls.author = mixer.blend(User), mixer.blend(User)
+        cls.old_post = mixer.blend(Post, author=cls.author)
+
+    def setUp(self) -> None:
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def timeline(self) -> List[int]:
+        return list(
+            TimelineEntry.objects.filter(user=self.follower).values_list(
+                'post_id',
+                flat=True,
+            ),
+        )
+
+    def test_backfill_on_follow(self) -> None:
+        """Подписка переносит в ленту уже опубликованные посты автора."""
+        self.follower_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,)),
+        )
+        self.assertEqual(self.timeline(), [self.old_post.pk])
+
+    def test_fan_out_on_post(self) -> None:
+        """Новый пост автора попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        new_post = mixer.blend(Post, author=self.author)
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+
+    def test_purge_on_unfollow(self) -> None:
+        """Отписка очищает ленту от постов автора."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.follower_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,)),
+        )
+        self.assertEqual(self.timeline(), [])
+
+    def test_post_delete(self) -> None:
+        """Удалённый пост пропадает из ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Post.objects.filter(author=self.author).delete()
+        self.assertEqual(self.timeline(), [])
+
+    def test_cursor_mode(self) -> None:
+        """Лента подписок листается курсором без повторов."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        mixer.cycle(settings.PAGE_SIZE * PAGES_AMMOUNT).blend(
+            Post,
+            author=self.author,
+        )
+        seen, cursor = [], ''
+        while cursor is not None:
+            page = self.follower_client.get(
+                reverse('posts:follow_index'),
+                {'cursor': cursor},
+            ).context['page_obj']
+            seen.extend(post.pk for post in page)
+            cursor = page.next_cursor
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), self.author.posts.count())
@@ -0,0 +1,77 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from posts import trending
+from posts.models import Group, Post, TrendingScore
+
+User = get_user_model()
+
+GROUP = TrendingScore.GROUP
+
+
+@override_settings(TRENDING_HALF_LIFE=10, TRENDING_MIN_SCORE=0.01)
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = mixer.blend(User)
+        cls.hot, cls.cold = mixer.cycle(2).blend(Group)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.now = time.time()
+
+    def test_decayed_scores(self) -> None:
+        """Старые события весят меньше новых."""
+        trending.record(GROUP, (self.cold.pk,) * 2, self.now - 20 * 60)
+        trending.record(GROUP, (self.hot.pk,), self.now)
+        scores = trending.scores(GROUP, self.now)
+        self.assertAlmostEqual(scores[self.cold.pk], 0.5)
+        self.assertAlmostEqual(scores[self.hot.pk], 1)
+
+    def test_new_post_is_counted(self) -> None:
+        """Публикация поста учитывается в рейтинге группы и хештега."""
+        post = mixer.blend(Post, author=self.author, group=self.hot)
+        post.text = '#горячее'
+        post.save()
+        mixer.blend(Post, author=self.author, group=self.hot, text='#тег')
+        self.assertEqual(trending.top(GROUP), [self.hot])
+        self.assertEqual(
+            [tag.name for tag in trending.top(TrendingScore.TAG)],
+            ['тег'],
+        )
+
+    def test_rollup_survives_cache_loss(self) -> None:
+        """Свёрнутый рейтинг переживает потерю кеша и продолжает затухать."""
+        trending.record(GROUP, (self.hot.pk,) * 4, self.now - 60)
+        trending.record(GROUP, (self.cold.pk,), self.now - 60)
+        self.assertEqual(trending.roll_up(GROUP, self.now), 2)
+        self.assertEqual(trending.roll_up(GROUP, self.now), 0)
+        cache.clear()
+        later = self.now + 10 * 60
+        scores = trending.scores(GROUP, later)
+        # Свёрнуто на предыдущую минуту, затем прошло ещё 10 минут.
+        self.assertAlmostEqual(scores[self.hot.pk], 4 * 0.5**1.1)
+        with mock.patch('posts.trending.time.time', return_value=later):
+            self.assertEqual(trending.top(GROUP), [self.hot, self.cold])
+
+    def test_rollup_forgets_faded(self) -> None:
+        """Угасшие оценки удаляются из таблицы."""
+        trending.record(GROUP, (self.cold.pk,), self.now - 60)
+        trending.roll_up(GROUP, self.now)
+        trending.roll_up(GROUP, self.now + 100 * 60)
+        self.assertFalse(TrendingScore.objects.exists())
+
+    def test_sidebar(self) -> None:
+        """Популярные группы показываются на главной."""
+        trending.record(GROUP, (self.hot.pk,), self.now)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response,
+            reverse('posts:group_list', args=(self.hot.slug,)),
+        )
@@ -63,6 +63,9 @@ class PostURLTest(TestCase):
             'missing': '/non-exists/',
         }
 
+    def setUp(self) -> None:
+        cache.clear()
+
     def test_http_statuses(self) -> None:
         """Соответствие статуса страниц по указанным адресам для всех."""
         httpstatuses = (
@@ -65,50 +65,25 @@ class TestViewsPosts(TestCase):
 
     def test_group_list_context(self) -> None:
         """Проверка правильности контекста для group_list."""
-        first_object = self.authorized_client_author.get(
+        context = self.authorized_client_author.get(
             reverse('posts:group_list', args=(self.group.slug,)),
-        ).context['page_obj'][0]
-        self.correct_page_obj_first_obj(first_object)
-
-        self.assertEqual(
-            self.authorized_client_author.get(
-                reverse(
-                    'posts:group_list',
-                    args=(self.group.slug,),
-                ),
-            ).context['group'],
-            self.group,
-        )
+        ).context
+        self.correct_page_obj_first_obj(context['page_obj'][0])
+        self.assertEqual(context['group'], self.group)
 
     def test_profile_context(self) -> None:
         """Проверка правильности контекста для profile."""
         follower_authorized_client = Client()
         follower_authorized_client.force_login(user=mixer.blend(User))
-        first_object = self.authorized_client_author.get(
+        context = self.authorized_client_author.get(
             reverse(
                 'posts:profile',
                 args=(self.user_author.username,),
             ),
-        ).context['page_obj'][0]
-        self.correct_page_obj_first_obj(first_object)
-        self.assertEqual(
-            self.authorized_client_author.get(
-                reverse(
-                    'posts:profile',
-                    args=(self.user_author.username,),
-                ),
-            ).context['author'],
-            self.user_author,
-        )
-
-        self.assertFalse(
-            self.authorized_client_author.get(
-                reverse(
-                    'posts:profile',
-                    args=(self.user_author.username,),
-                ),
-            ).context['following'],
-        )
+        ).context
+        self.correct_page_obj_first_obj(context['page_obj'][0])
+        self.assertEqual(context['author'], self.user_author)
+        self.assertFalse(context['following'])
 
         self.assertFalse(
             follower_authorized_client.get(
@@ -0,0 +1,63 @@
+from typing import Iterable
+
+from django.contrib.auth import get_user_model
+from django.db.models.query import QuerySet
+
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+ORDERING = ('created', 'post_id')
+BATCH_SIZE = 500
+
+
+def _insert(entries: Iterable[TimelineEntry]) -> None:
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out(post: Post) -> None:
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    _insert(
+        TimelineEntry(user_id=user_id, post=post, created=post.created)
+        for user_id in Follow.objects.filter(
+            author_id=post.author_id,
+        )
+        .values_list('user_id', flat=True)
+        .iterator()
+    )
+
+
+def backfill(user_id: int, author_id: int) -> None:
+    """Добавляет в ленту подписчика все посты нового автора."""
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post_id, created=created)
+        for post_id, created in Post.objects.filter(
+            author_id=author_id,
+        )
+        .values_list('pk', 'created')
+        .iterator()
+    )
+
+
+def purge(user_id: int, author_id: int) -> None:
+    """Убирает из ленты подписчика посты автора, от которого он отписался."""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id,
+    ).delete()
+
+
+def feed(user: User) -> QuerySet:
+    """Возвращает ленту подписок пользователя от новых постов к старым."""
+    return (
+        TimelineEntry.objects.filter(user=user)
+        .select_related(
+            'post__author',
+            'post__group',
+        )
+        .order_by('-created', '-post_id')
+    )
@@ -0,0 +1,142 @@
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Model
+
+from posts.models import Group, Post, PostTag, Tag, TrendingScore
+
+BUCKET_KEY = 'trending:{kind}:{minute}'
+TOP_KEY = 'trending:top:{kind}'
+MODELS = {
+    TrendingScore.GROUP: Group,
+    TrendingScore.TAG: Tag,
+}
+
+
+def current_minute(now: Optional[float] = None) -> int:
+    return int((time.time() if now is None else now) // 60)
+
+
+def decay(minutes: float) -> float:
+    """Возвращает вес события, случившегося minutes минут назад."""
+    return 0.5 ** (minutes / settings.TRENDING_HALF_LIFE)
+
+
+def record(kind: str, ids: Iterable[int], now: Optional[float] = None) -> None:
+    """Добавляет события в счётчик текущей минуты.
+
+    Минутный счётчик хранится в кеше одним словарём и обновляется
+    чтением и записью: одновременные публикации могут потерять
+    отдельное событие, для рейтинга это допустимо.
+    """
+    ids = list(ids)
+    if not ids:
+        return
+    key = BUCKET_KEY.format(kind=kind, minute=current_minute(now))
+    bucket = cache.get(key, {})
+    for pk in ids:
+        bucket[pk] = bucket.get(pk, 0) + 1
+    cache.set(key, bucket, settings.TRENDING_BUCKET_TIMEOUT)
+
+
+def post_published(post: Post) -> None:
+    """Учитывает новый пост в рейтингах его группы и хештегов."""
+    if post.group_id:
+        record(TrendingScore.GROUP, (post.group_id,))
+    record(
+        TrendingScore.TAG,
+        PostTag.objects.filter(post=post).values_list('tag_id', flat=True),
+    )
+
+
+def _rollup(kind: str) -> Tuple[Dict[int, float], Optional[int]]:
+    """Читает свёрнутые оценки и минуту, до которой они посчитаны."""
+    rows = TrendingScore.objects.filter(kind=kind).values_list(
+        'object_id',
+        'score',
+        'updated',
+    )
+    scores, until = {}, None
+    for pk, score, updated in rows:
+        scores[pk] = score
+        until = int(updated.timestamp() // 60)
+    return scores, until
+
+
+def _accumulate(kind: str, minute: int) -> Dict[int, float]:
+    """Считает оценки на минуту minute.
+
+    Свёрнутые оценки затухают с момента свёртки, к ним добавляются
+    минутные счётчики после неё; все счётчики читаются одним get_many.
+    """
+    rolled, until = _rollup(kind)
+    scores = {
+        pk: score * decay(minute - until) for pk, score in rolled.items()
+    }
+    first = minute - settings.TRENDING_BUCKET_TIMEOUT // 60
+    if until is not None:
+        first = max(first, until + 1)
+    keys = {
+        BUCKET_KEY.format(kind=kind, minute=bucket_minute): bucket_minute
+        for bucket_minute in range(first, minute + 1)
+    }
+    for key, bucket in cache.get_many(keys).items():
+        weight = decay(minute - keys[key])
+        for pk, events in bucket.items():
+            scores[pk] = scores.get(pk, 0) + events * weight
+    return scores
+
+
+def scores(kind: str, now: Optional[float] = None) -> Dict[int, float]:
+    """Возвращает текущие оценки объектов без обхода таблицы постов."""
+    return _accumulate(kind, current_minute(now))
+
+
+def top(kind: str, limit: Optional[int] = None) -> List[Model]:
+    """Возвращает самые популярные группы или хештеги.
+
+    Порядок пересчитывается не чаще раза в TRENDING_CACHE_TIMEOUT секунд.
+    """
+    limit = limit or settings.TRENDING_SIZE
+    key = TOP_KEY.format(kind=kind)
+    ids = cache.get(key)
+    if ids is None:
+        ids = [
+            pk
+            for pk, _ in sorted(
+                scores(kind).items(),
+                key=lambda item: (-item[1], -item[0]),
+            )
+        ]
+        cache.set(key, ids, settings.TRENDING_CACHE_TIMEOUT)
+    found = MODELS[kind].objects.in_bulk(ids[:limit])
+    return [found[pk] for pk in ids[:limit] if pk in found]
+
+
+def roll_up(kind: str, now: Optional[float] = None) -> int:
+    """Сворачивает завершённые минуты в таблицу TrendingScore.
+
+    Оценки ниже TRENDING_MIN_SCORE удаляются, поэтому таблица хранит
+    только объекты, которые ещё могут попасть в рейтинг.
+
+    Returns:
+        Количество сохранённых оценок.
+    """
+    minute = current_minute(now) - 1
+    _, until = _rollup(kind)
+    if until is not None and until >= minute:
+        return 0
+    updated = datetime.fromtimestamp(minute * 60, timezone.utc)
+    rows = [
+        TrendingScore(kind=kind, object_id=pk, score=score, updated=updated)
+        for pk, score in _accumulate(kind, minute).items()
+        if score >= settings.TRENDING_MIN_SCORE
+    ]
+    with transaction.atomic():
+        TrendingScore.objects.filter(kind=kind).delete()
+        TrendingScore.objects.bulk_create(rows)
+    return len(rows)
@@ -8,6 +8,8 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('create/', views.post_create, name='post_create'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('tag/<str:name>/', views.tag_posts, name='tag'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('posts/<int:pk>/', views.post_detail, name='post_detail'),
     path('profile/<str:username>/', views.profile, name='profile'),
@@ -1,17 +1,58 @@
+from typing import Dict, List
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.utils.functional import SimpleLazyObject
 
-from core.utils import paginate
+from core import fragments, thumbnails
+from core.cache import cache_page_tagged, conditional_page, tag_response
+from core.utils import CURSOR_PARAM, CursorPaginator, paginate
+from posts import search as post_search
+from posts import tags
+from posts.cache import AUTHOR_TAG, FEED_INDEX, GROUP_TAG, POST_TAG
+from posts.counters import author_stats
+from posts.feeds import follow_feed
 from posts.forms import CommentForm, PostForm
-from posts.models import Follow, Group, Post
+from posts.models import Follow, Group, Post, Tag
 
 User = get_user_model()
 
 
-@cache_page(20, key_prefix='index_page')
+def is_following(request: HttpRequest, username: str) -> bool:
+    return bool(
+        request.user.is_authenticated
+        and Follow.objects.filter(
+            user=request.user,
+            author__username=username,
+        ).exists(),
+    )
+
+
+def post_author_tags(request: HttpRequest, pk: int) -> List[str]:
+    return [
+        AUTHOR_TAG.format(username=username)
+        for username in User.objects.filter(posts__pk=pk).values_list(
+            'username',
+            flat=True,
+        )
+    ]
+
+
+@fragments.register('posts/includes/follow_button.html')
+def follow_button(request: HttpRequest, username: str) -> Dict[str, object]:
+    return {
+        'username': username,
+        'following': is_following(request, username),
+    }
+
+
+@conditional_page(FEED_INDEX)
+@fragments.shared_page
+@cache_page_tagged(settings.PAGE_CACHE_TIMEOUT, FEED_INDEX)
 def index(request: HttpRequest) -> HttpResponse:
     return render(
         request,
@@ -28,6 +69,9 @@ def index(request: HttpRequest) -> HttpResponse:
     )
 
 
+@conditional_page(GROUP_TAG)
+@fragments.shared_page
+@cache_page_tagged(settings.PAGE_CACHE_TIMEOUT, GROUP_TAG)
 def group_posts(request: HttpRequest, slug: str) -> HttpResponse:
     group = get_object_or_404(Group, slug=slug)
     return render(
@@ -46,6 +90,9 @@ def group_posts(request: HttpRequest, slug: str) -> HttpResponse:
     )
 
 
+@conditional_page(AUTHOR_TAG)
+@fragments.shared_page
+@cache_page_tagged(settings.PAGE_CACHE_TIMEOUT, AUTHOR_TAG)
 def profile(request: HttpRequest, username: str) -> HttpResponse:
     author = get_object_or_404(User, username=username)
     return render(
@@ -56,31 +103,43 @@ def profile(request: HttpRequest, username: str) -> HttpResponse:
                 request,
                 author.posts.select_related(
                     'author',
+                    'group',
                 ),
             ),
             'author': author,
-            'following': bool(
-                request.user.is_authenticated
-                and author.following.filter(user=request.user).exists(),
+            'stats': author_stats(author.pk),
+            # Кнопка подписки рисуется фрагментом: общая страница
+            # профиля не должна обращаться к сессии.
+            'following': SimpleLazyObject(
+                lambda: is_following(request, username),
             ),
         },
     )
 
 
+@conditional_page(POST_TAG, post_author_tags)
+@cache_page_tagged(settings.PAGE_CACHE_TIMEOUT, POST_TAG)
 def post_detail(request: HttpRequest, pk: int) -> HttpResponse:
-    post = get_object_or_404(Post, pk=pk)
-    return render(
-        request,
-        'posts/post_detail.html',
-        {
-            'post': post,
-            'comments': post.comments.select_related(
-                'author',
-            ),
-            'form': CommentForm(
-                request.POST or None,
-            ),
-        },
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'),
+        pk=pk,
+    )
+    return tag_response(
+        render(
+            request,
+            'posts/post_detail.html',
+            {
+                'post': post,
+                'stats': author_stats(post.author_id),
+                'comments': post.comments.select_related(
+                    'author',
+                ),
+                'form': CommentForm(
+                    request.POST or None,
+                ),
+            },
+        ),
+        AUTHOR_TAG.format(username=post.author.username),
     )
 
 
@@ -99,7 +158,9 @@ def post_create(request: HttpRequest) -> HttpResponse:
             },
         )
     form.instance.author = request.user
-    form.save()
+    post = form.save()
+    if post.image:
+        transaction.on_commit(lambda: thumbnails.pregenerate(post.image))
     return redirect('posts:profile', request.user.username)
 
 
@@ -123,6 +184,8 @@ def post_edit(request: HttpRequest, pk: int) -> HttpResponse:
             },
         )
     post.save()
+    if post.image and 'image' in form.changed_data:
+        transaction.on_commit(lambda: thumbnails.pregenerate(post.image))
     return redirect('posts:post_detail', pk)
 
 
@@ -136,21 +199,47 @@ def add_comment(request: HttpRequest, pk: int) -> HttpResponse:
     return redirect('posts:post_detail', pk=pk)
 
 
+def search(request: HttpRequest) -> HttpResponse:
+    query = request.GET.get('q', '').strip()
+    return render(
+        request,
+        'posts/search.html',
+        {
+            'query': query,
+            'page_obj': post_search.search(
+                query,
+                request.GET.get(CURSOR_PARAM),
+                settings.PAGE_SIZE,
+            ),
+        },
+    )
+
+
+def tag_posts(request: HttpRequest, name: str) -> HttpResponse:
+    tag = get_object_or_404(Tag, name=name.lower())
+    page_obj = CursorPaginator(
+        tags.feed(tag),
+        settings.PAGE_SIZE,
+        tags.ORDERING,
+    ).page(request.GET.get(CURSOR_PARAM))
+    page_obj.object_list = [post_tag.post for post_tag in page_obj]
+    return render(
+        request,
+        'posts/tag.html',
+        {
+            'tag': tag,
+            'page_obj': page_obj,
+        },
+    )
+
+
 @login_required
 def follow_index(request: HttpRequest) -> HttpResponse:
     return render(
         request,
         'posts/follow.html',
         {
-            'page_obj': paginate(
-                request,
-                Post.objects.filter(
-                    author__following__user=request.user,
-                ).select_related(
-                    'author',
-                    'group',
-                ),
-            ),
+            'page_obj': follow_feed(request),
         },
     )
 
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve(strict=True).parent.parent
@@ -12,6 +13,14 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = str(BASE_DIR / 'media')
 
+# Отдавать файлы MEDIA_ROOT из приложения, если перед ним нет nginx.
+MEDIA_SERVE = True
+
+# Префикс internal-location nginx; если задан, тело файла отдаёт nginx.
+MEDIA_ACCEL_REDIRECT = None
+
+MEDIA_CACHE_TIMEOUT = 60 * 60 * 24
+
 DEBUG = False
 
 ALLOWED_HOSTS = [
@@ -45,7 +54,9 @@ INSTALLED_APPS = [
 # fmt: on
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -58,7 +69,7 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.timing.TimedDjangoTemplates',
         'DIRS': [str(BASE_DIR / 'templates'), BASE_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,6 +86,20 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'thumbnails': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': str(BASE_DIR / 'cache' / 'thumbnails'),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -113,6 +138,21 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 
 STATIC_URL = '/static/'
 
+STATIC_ROOT = str(BASE_DIR / 'collected_static')
+
+# Имена с хешем и сжатые копии создаёт collectstatic. Без собранного
+# манифеста страницы не отрисуются, поэтому хранилище включается явно
+# переменной STATIC_MANIFEST=1 и для collectstatic, и для сервера.
+if os.environ.get('STATIC_MANIFEST') == '1':
+    STATICFILES_STORAGE = (
+        'core.staticfiles.CompressedManifestStaticFilesStorage'
+    )
+
+# Отдавать STATIC_ROOT из приложения, если перед ним нет nginx.
+STATIC_SERVE = True
+
+STATIC_CACHE_TIMEOUT = 60 * 60
+
 PAGE_SIZE = 10
 
 LOGIN_URL = 'users:login'
@@ -122,3 +162,93 @@ LOGIN_REDIRECT_URL = 'posts:index'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+FOLLOW_MERGE_THRESHOLD = 500
+
+FOLLOW_MERGE_DEPTH = 100
+
+AUTHOR_POSTS_CACHE_TIMEOUT = 60 * 60 * 24
+
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+
+PAGE_CACHE_STALE_TIMEOUT = 60 * 10
+
+PAGE_CACHE_LOCK_TIMEOUT = 10
+
+PAGE_CACHE_WAIT_STEP = 0.05
+
+PAGE_CACHE_PROXY_TIMEOUT = 60 * 5
+
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+COMPRESSION_MIN_LENGTH = 200
+
+COMPRESSION_CACHE_TIMEOUT = 60 * 60
+
+# Заголовок Server-Timing раскрывает число SQL-запросов и время этапов,
+# поэтому без DEBUG он отдаётся только сотрудникам, если не включён здесь.
+SERVER_TIMING_HEADER = False
+
+SERVER_TIMING_LOG_INTERVAL = 60
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'timing': {
+            'format': '%(asctime)s %(name)s %(message)s',
+        },
+    },
+    'handlers': {
+        'timing': {
+            'class': 'logging.StreamHandler',
+            'level': 'INFO',
+            'formatter': 'timing',
+        },
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['timing'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+TRENDING_HALF_LIFE = 60
+
+TRENDING_BUCKET_TIMEOUT = 60 * 60 * 3
+
+TRENDING_MIN_SCORE = 0.01
+
+TRENDING_SIZE = 5
+
+TRENDING_CACHE_TIMEOUT = 60
+
+IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+
+IMAGE_MAX_PIXELS = 40 * 10**6
+
+IMAGE_MAX_SIDE = 2560
+
+THUMBNAIL_BACKEND = 'core.thumbnails.ThumbnailBackend'
+
+THUMBNAIL_KVSTORE = 'core.thumbnails.KVStore'
+
+THUMBNAIL_ENGINE = 'core.thumbnails.Engine'
+
+# Записи о миниатюрах общие для всех процессов и переживают их
+# перезапуск. На нескольких серверах сюда нужен общий memcached.
+THUMBNAIL_CACHE = 'thumbnails'
+
+THUMBNAIL_WORKERS = 2
+
+THUMBNAIL_RETRY_AFTER = 60 * 5
+
+THUMBNAIL_PREGENERATE = (('960x339', {'crop': 'center', 'upscale': True}),)
+
+THUMBNAIL_WIDTHS = (480, 720, 960)
+
+THUMBNAIL_FORMATS = ('WEBP', 'JPEG')
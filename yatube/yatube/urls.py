@@ -1,9 +1,10 @@
 from django.apps import apps
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import serve_media
+
 handler404 = 'core.views.page_not_found'
 handler403 = 'core.views.csrf_failure'
 
@@ -24,8 +25,7 @@ urlpatterns = [
     path('auth/', include('django.contrib.auth.urls')),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL,
-        document_root=settings.MEDIA_ROOT,
+if settings.MEDIA_SERVE:
+    urlpatterns.append(
+        path(f'{settings.MEDIA_URL.lstrip("/")}<path:path>', serve_media),
     )
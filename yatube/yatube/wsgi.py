@@ -5,3 +5,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+from core.media import MediaApplication  # noqa: E402
+from core.staticfiles import StaticApplication  # noqa: E402
+
+application = StaticApplication(MediaApplication(application))